@@ -1,7 +1,9 @@
+import contextlib
 import json
+import math
 import re
 
-from liteTools import LL, DT, RT, SuperString, TaskError, CpdailyTools
+from liteTools import LL, DT, RT, NT, SuperString, TaskError, CpdailyTools
 
 
 class Collection:
@@ -32,79 +34,100 @@ class Collection:
         self.session.post(url=url, headers={'content-type': 'application/json'}, data=json.dumps(params),
                           verify=False)
 
+    def _queryPages(self, url, headers):
+        '''
+        按页获取列表: 首页得到总数后, 其余页按顺序并发预取(调用方提前结束迭代时停止预取)
+        :params url: 分页列表接口
+        :returns generator: (页码, 接口返回的json)
+        '''
+        pageSize = int(self.userInfo['pageSize'])
+        if pageSize <= 0:
+            raise TaskError(f"pageSize应为正整数, 而不是『{pageSize}』", 301)
+
+        def fetch(pageNumber):
+            pageReq = {"pageNumber": pageNumber, "pageSize": pageSize}
+            res = self.session.post(url, headers=headers,
+                                    data=json.dumps(pageReq), verify=False)
+            return res.json()
+
+        res = fetch(1)
+        yield 1, res
+        totalSize = res['datas']['totalSize']
+        rowCount = len(res['datas']['rows'])
+        if 0 < rowCount < min(pageSize, totalSize):
+            # 服务器限制了每页的条数, 按服务器实际使用的每页条数分页
+            LL.log(1, f"服务器每页最多返回{rowCount}条, 按每页{rowCount}条获取")
+            pageSize = rowCount
+        pageCount = math.ceil(totalSize / pageSize)
+        prefetch = NT.orderedPrefetch(
+            fetch, range(2, pageCount + 1), self.userInfo['prefetchWindow'])
+        with contextlib.closing(prefetch) as pages:
+            for pageNumber, res in pages:
+                yield pageNumber, res
+
     # 查询表单
     def queryForm(self):
         headers = self.session.headers
         headers['Content-Type'] = 'application/json'
         url = f'{self.host}wec-counselor-collector-apps/stu/collector/queryCollectorProcessingList'
-        # 第一次请求接口获取cookies（MOD_AUTH_CAS）
-        self.session.post(url, headers=headers,
-                          data=json.dumps({}), verify=False)
-        # 获取首页信息, 获取页数
-        pageSize = 20
-        pageReq = {"pageNumber": 1, "pageSize": pageSize}
-        pageNumber = 0
-        totalSize = 1
-        # 按页遍历
-        while pageNumber*pageSize <= totalSize:
-            pageNumber += 1
-            pageReq["pageNumber"] = pageNumber
-            # 获取**任务列表**数据
-            res = self.session.post(url, headers=headers,
-                                    data=json.dumps(pageReq), verify=False)
-            res = res.json()
-            LL.log(1, f"获取到的第{pageNumber}页任务列表", res)
-            # 在**首页**获取历史信息收集**总数**
-            if pageNumber == 1:
-                # 历史信息收集总数
-                totalSize = res['datas']['totalSize']
-                # 如果没有获取到历史任务则报错
-                if totalSize == 0:
-                    raise TaskError("没有获取到信息收集任务", 400)
-            # 按页中任务遍历
-            for task in res['datas']['rows']:
-                if self.userInfo.get('title'):
-                    # 如果任务需要匹配标题
-                    taskTitle = SuperString(self.userInfo['title'])
-                    if not taskTitle.match(task["subject"]):
-                        # 跳过标题不匹配的任务
-                        continue
-                    if self.userInfo.get('signLevel') == 1 and task['isHandled'] == 1:
-                        # 如果仅填报"未填报的任务"且相应任务已被填报，则报错
-                        raise TaskError(f"收集任务已经被填报", 100, task['subject'])
-                else:
-                    # 如果不需要匹配标题，则获取第一个任务
-                    if self.userInfo.get('signLevel') == 1 and task['isHandled'] == 1:
-                        # 仅填报"未填报的任务"时如果任务已被填报，则跳过该任务
-                        continue
-                # 提取任务的基本信息
-                self.wid = task['wid']
-                self.formWid = task['formWid']
-                self.instanceWid = task.get('instanceWid', '')
-                self.taskName = task['subject']
-                # 获取任务详情
-                url = f'{self.host}wec-counselor-collector-apps/stu/collector/detailCollector'
-                params = {"collectorWid": self.wid,
-                          "instanceWid": self.instanceWid}
-                res = self.session.post(
-                    url, headers=headers, data=json.dumps(params), verify=False)
-                res = res.json()
-                LL.log(1, '查询任务详情返回结果', res['datas'])
-                try:
-                    self.schoolTaskWid = res['datas']['collector']['schoolTaskWid']
-                except TypeError:
-                    self.schoolTaskWid = ''
-                    LL.log(1, '循环普通任务实例wid为空')
-                # 获取任务表单
-                url = f'{self.host}wec-counselor-collector-apps/stu/collector/getFormFields'
-                params = {"pageSize": 9999, "pageNumber": 1,
-                          "formWid": self.formWid, "collectorWid": self.wid, "instanceWid": self.instanceWid}
-                res = self.session.post(
-                    url, headers=headers, data=json.dumps(params), verify=False)
-                res = res.json()
-                LL.log(1, '查询任务表单返回结果', res['datas'])
-                self.task = res['datas']['rows']
-                return
+        # 第一次请求接口获取cookies（MOD_AUTH_CAS）(同一session只请求一次)
+        CpdailyTools.primeApp(self.session, self.host, 'wec-counselor-collector-apps')
+        # 按页遍历(首页获取总数后, 其余页并发预取)
+        with contextlib.closing(self._queryPages(url, headers)) as pages:
+            for pageNumber, res in pages:
+                LL.log(1, f"获取到的第{pageNumber}页任务列表", res)
+                # 在**首页**获取历史信息收集**总数**
+                if pageNumber == 1:
+                    # 历史信息收集总数
+                    totalSize = res['datas']['totalSize']
+                    # 如果没有获取到历史任务则报错
+                    if totalSize == 0:
+                        raise TaskError("没有获取到信息收集任务", 400)
+                # 按页中任务遍历
+                for task in res['datas']['rows']:
+                    if self.userInfo.get('title'):
+                        # 如果任务需要匹配标题
+                        taskTitle = SuperString(self.userInfo['title'])
+                        if not taskTitle.match(task["subject"]):
+                            # 跳过标题不匹配的任务
+                            continue
+                        if self.userInfo.get('signLevel') == 1 and task['isHandled'] == 1:
+                            # 如果仅填报"未填报的任务"且相应任务已被填报，则报错
+                            self.signTask_.instanceWid = task.get('instanceWid') or task['wid']
+                            raise TaskError(f"收集任务已经被填报", 100, task['subject'])
+                    else:
+                        # 如果不需要匹配标题，则获取第一个任务
+                        if self.userInfo.get('signLevel') == 1 and task['isHandled'] == 1:
+                            # 仅填报"未填报的任务"时如果任务已被填报，则跳过该任务
+                            continue
+                    # 提取任务的基本信息
+                    self.wid = task['wid']
+                    self.formWid = task['formWid']
+                    self.instanceWid = task.get('instanceWid', '')
+                    self.taskName = task['subject']
+                    # 获取任务详情
+                    url = f'{self.host}wec-counselor-collector-apps/stu/collector/detailCollector'
+                    params = {"collectorWid": self.wid,
+                              "instanceWid": self.instanceWid}
+                    res = self.session.post(
+                        url, headers=headers, data=json.dumps(params), verify=False)
+                    res = res.json()
+                    LL.log(1, '查询任务详情返回结果', res['datas'])
+                    try:
+                        self.schoolTaskWid = res['datas']['collector']['schoolTaskWid']
+                    except TypeError:
+                        self.schoolTaskWid = ''
+                        LL.log(1, '循环普通任务实例wid为空')
+                    # 获取任务表单
+                    url = f'{self.host}wec-counselor-collector-apps/stu/collector/getFormFields'
+                    params = {"pageSize": 9999, "pageNumber": 1,
+                              "formWid": self.formWid, "collectorWid": self.wid, "instanceWid": self.instanceWid}
+                    res = self.session.post(
+                        url, headers=headers, data=json.dumps(params), verify=False)
+                    res = res.json()
+                    LL.log(1, '查询任务表单返回结果', res['datas'])
+                    self.task = res['datas']['rows']
+                    return
         raise TaskError("没有获取到合适的信息收集任务", 400)
 
     # 获取历史签到任务详情
@@ -112,98 +135,88 @@ class Collection:
         '''获取历史签到任务详情'''
         headers = self.session.headers
         headers['Content-Type'] = 'application/json;charset=UTF-8'
-        # 获取首页信息, 获取页数
-        pageSize = 20
         url = f'{self.host}wec-counselor-collector-apps/stu/collector/queryCollectorHistoryList'
-        pageReq = {"pageNumber": 1, "pageSize": pageSize}
-        pageNumber = 0
-        totalSize = 1
-        # 按页遍历
-        while pageNumber*pageSize <= totalSize:
-            pageNumber += 1
-            pageReq["pageNumber"] = pageNumber
-            # 获取**任务列表**数据
-            res = self.session.post(url, headers=headers,
-                                    data=json.dumps(pageReq), verify=False)
-            res = res.json()
-            LL.log(1, f"获取到第{pageNumber}页历史信息收集数据", res)
-            # 在**首页**获取历史信息收集**总数**
-            if pageNumber == 1:
-                # 历史信息收集总数
-                totalSize = res['datas']['totalSize']
-                # 如果没有获取到历史任务则报错
-                if totalSize < 0:
-                    raise TaskError(f"没有获取到历史任务", 301, self.taskName)
-            # 按页中任务遍历
-            for task in res['datas']['rows']:
-                if task['isHandled'] == 1 and task['formWid'] == self.formWid:
-                    # 找到和当前任务匹配的历史已处理任务，开始获取表单
-                    historyInstanceWid = task['instanceWid']
-                    historyWid = task['wid']
-                    # 模拟请求
-                    url = f'{self.host}wec-counselor-collector-apps/stu/collector/getUnSeenQuestion'
-                    self.session.post(url, headers=headers, data=json.dumps(
-                        {"wid": self.wid, "instanceWid": self.instanceWid}), verify=False)
-                    # 模拟请求:获取历史信息收集信息
-                    url = f'{self.host}wec-counselor-collector-apps/stu/collector/detailCollector'
-                    self.session.post(url, headers=headers, data=json.dumps(
-                        {"collectorWid": self.wid, "instanceWid": self.instanceWid}), verify=False)
-                    # 获取表单
-                    url = f'{self.host}wec-counselor-collector-apps/stu/collector/getFormFields'
-                    formReq = {"pageNumber": 1, "pageSize": 9999, "formWid": self.formWid,
-                               "collectorWid": historyWid, "instanceWid": historyInstanceWid}
-                    res = self.session.post(url, headers=headers, data=json.dumps(formReq),
-                                            verify=False)
-                    res = res.json()
-                    # 模拟请求
-                    url = f'{self.host}wec-counselor-collector-apps/stu/collector/queryNotice'
-                    self.session.post(url, headers=headers,
-                                      data=json.dumps({}), verify=False)
-                    # 处理表单
-                    form = res['datas']['rows']
-                    # 逐个处理表单内问题
-                    for item in form:
-                        # 填充额外参数
-                        item['show'] = True
-                        item['formType'] = '0'  # 盲猜是任务类型、待确认
-                        item['sortNum'] = str(item['sort'])  # 盲猜是sort排序
-                        if item['fieldType'] == '2':
-                            '''如果是单选题，需要删掉多余选项'''
-                            item['fieldItems'] = list(
-                                filter(lambda x: x['isSelected'], item['fieldItems']))
-                            if item['fieldItems']:
-                                '''如果已选有选项，则将itemWid填入value中'''
-                                item['value'] = item['fieldItems'][0]['itemWid']
-                        elif item['fieldType'] == '3':
-                            '''如果是多选题，也需要删掉多余选项'''
-                            item['fieldItems'] = list(
-                                filter(lambda x: x['isSelected'], item['fieldItems']))
-                            if item['fieldItems']:
-                                '''如果已选有选项，则将itemWid填入value中'''
-                                item['value'] = ','.join(
-                                    [i['itemWid'] for i in item['fieldItems']])
-                        elif item['fieldType'] == '4':
-                            '''如果是图片上传类型'''
-                            # 填充其他信息
-                            item.setdefault('http', {
-                                'defaultOptions': {
-                                    'customConfig': {
-                                        'pageNumberKey': 'pageNumber',
-                                        'pageSizeKey': 'pageSize',
-                                        'pageDataKey': 'rows',
-                                        'pageTotalKey': 'totalSize',
-                                        'dataKey': 'datas',
-                                        'codeKey': 'code',
-                                        'messageKey': 'message'
+        # 按页遍历(首页获取总数后, 其余页并发预取)
+        with contextlib.closing(self._queryPages(url, headers)) as pages:
+            for pageNumber, res in pages:
+                LL.log(1, f"获取到第{pageNumber}页历史信息收集数据", res)
+                # 在**首页**获取历史信息收集**总数**
+                if pageNumber == 1:
+                    # 历史信息收集总数
+                    totalSize = res['datas']['totalSize']
+                    # 如果没有获取到历史任务则报错
+                    if totalSize < 0:
+                        raise TaskError(f"没有获取到历史任务", 301, self.taskName)
+                # 按页中任务遍历
+                for task in res['datas']['rows']:
+                    if task['isHandled'] == 1 and task['formWid'] == self.formWid:
+                        # 找到和当前任务匹配的历史已处理任务，开始获取表单
+                        historyInstanceWid = task['instanceWid']
+                        historyWid = task['wid']
+                        # 模拟请求
+                        url = f'{self.host}wec-counselor-collector-apps/stu/collector/getUnSeenQuestion'
+                        self.session.post(url, headers=headers, data=json.dumps(
+                            {"wid": self.wid, "instanceWid": self.instanceWid}), verify=False)
+                        # 模拟请求:获取历史信息收集信息
+                        url = f'{self.host}wec-counselor-collector-apps/stu/collector/detailCollector'
+                        self.session.post(url, headers=headers, data=json.dumps(
+                            {"collectorWid": self.wid, "instanceWid": self.instanceWid}), verify=False)
+                        # 获取表单
+                        url = f'{self.host}wec-counselor-collector-apps/stu/collector/getFormFields'
+                        formReq = {"pageNumber": 1, "pageSize": 9999, "formWid": self.formWid,
+                                   "collectorWid": historyWid, "instanceWid": historyInstanceWid}
+                        res = self.session.post(url, headers=headers, data=json.dumps(formReq),
+                                                verify=False)
+                        res = res.json()
+                        # 模拟请求
+                        url = f'{self.host}wec-counselor-collector-apps/stu/collector/queryNotice'
+                        self.session.post(url, headers=headers,
+                                          data=json.dumps({}), verify=False)
+                        # 处理表单
+                        form = res['datas']['rows']
+                        # 逐个处理表单内问题
+                        for item in form:
+                            # 填充额外参数
+                            item['show'] = True
+                            item['formType'] = '0'  # 盲猜是任务类型、待确认
+                            item['sortNum'] = str(item['sort'])  # 盲猜是sort排序
+                            if item['fieldType'] == '2':
+                                '''如果是单选题，需要删掉多余选项'''
+                                item['fieldItems'] = list(
+                                    filter(lambda x: x['isSelected'], item['fieldItems']))
+                                if item['fieldItems']:
+                                    '''如果已选有选项，则将itemWid填入value中'''
+                                    item['value'] = item['fieldItems'][0]['itemWid']
+                            elif item['fieldType'] == '3':
+                                '''如果是多选题，也需要删掉多余选项'''
+                                item['fieldItems'] = list(
+                                    filter(lambda x: x['isSelected'], item['fieldItems']))
+                                if item['fieldItems']:
+                                    '''如果已选有选项，则将itemWid填入value中'''
+                                    item['value'] = ','.join(
+                                        [i['itemWid'] for i in item['fieldItems']])
+                            elif item['fieldType'] == '4':
+                                '''如果是图片上传类型'''
+                                # 填充其他信息
+                                item.setdefault('http', {
+                                    'defaultOptions': {
+                                        'customConfig': {
+                                            'pageNumberKey': 'pageNumber',
+                                            'pageSizeKey': 'pageSize',
+                                            'pageDataKey': 'rows',
+                                            'pageTotalKey': 'totalSize',
+                                            'dataKey': 'datas',
+                                            'codeKey': 'code',
+                                            'messageKey': 'message'
+                                        }
                                     }
-                                }
-                            })
-                            item['uploadPolicyUrl'] = '/wec-counselor-collector-apps/stu/obs/getUploadPolicy'
-                            item['saveAttachmentUrl'] = '/wec-counselor-collector-apps/stu/collector/saveAttachment'
-                            item['previewAttachmentUrl'] = '/wec-counselor-collector-apps/stu/collector/previewAttachment'
-                            item['downloadMediaUrl'] = '/wec-counselor-collector-apps/stu/collector/downloadMedia'
-                    self.historyTaskData['form'] = form
-                    return self.historyTaskData
+                                })
+                                item['uploadPolicyUrl'] = '/wec-counselor-collector-apps/stu/obs/getUploadPolicy'
+                                item['saveAttachmentUrl'] = '/wec-counselor-collector-apps/stu/collector/saveAttachment'
+                                item['previewAttachmentUrl'] = '/wec-counselor-collector-apps/stu/collector/previewAttachment'
+                                item['downloadMediaUrl'] = '/wec-counselor-collector-apps/stu/collector/downloadMedia'
+                        self.historyTaskData['form'] = form
+                        return self.historyTaskData
         # 如果没有获取到历史信息收集则报错
         raise TaskError(f"没有找到匹配的历史任务", 301, self.taskName)
 
@@ -462,6 +475,7 @@ class Collection:
         res = res.json()
         if res['datas']['collector']['isUserSubmit'] == 1:
             self.signTask_.code = 101
+            self.signTask_.instanceWid = self.instanceWid or self.wid
         else:
             raise TaskError(f'提交表单返回『{data}』且任务状态仍是未签到', 300, self.taskName)
         return '[%s]%s' % (data['message'], self.taskName)
@@ -1,7 +1,8 @@
+import contextlib
 import json
 import re
 
-from liteTools import LL, DT, RT, MT, SuperString, TaskError, CpdailyTools
+from liteTools import LL, DT, RT, MT, NT, SuperString, TaskError, CpdailyTools
 
 
 class sleepCheck:
@@ -22,14 +23,9 @@ class sleepCheck:
     def getUnSignedTasks(self):
         headers = self.session.headers
         headers['Content-Type'] = 'application/json'
-        # 第一次请求接口获取cookies（MOD_AUTH_CAS）
-        url = f'{self.host}wec-counselor-attendance-apps/student/attendance/getStuAttendacesInOneDay'
-        self.session.post(url, headers=headers,
-                          data=json.dumps({}), verify=False)
-        # 第二次请求接口，真正的拿到具体任务
-        res = self.session.post(url, headers=headers,
-                                data=json.dumps({}), verify=False)
-        res = res.json()
+        # 获取当日任务列表(同一用户的多个任务共用, 提交成功或超过probeTTL秒后重新获取)
+        res = CpdailyTools.getDailyTaskList(
+            self.session, self.host, 'wec-counselor-attendance-apps', self.userInfo['probeTTL'])
         LL.log(1, '返回的列表数据', res['datas'])
 
         # 获取到的任务总表
@@ -44,6 +40,7 @@ class sleepCheck:
                 for righttask in taskList:
                     if taskTitle.match(righttask['taskName']):
                         self.taskName = righttask['taskName']
+                        self.signTask_.instanceWid = righttask['signInstanceWid']
                         if not i <= signLevel:
                             raise TaskError(f'任务无需签到', 100, self.taskName)
                         LL.log(1, '匹配标题的任务', righttask['taskName'])
@@ -84,6 +81,29 @@ class sleepCheck:
 
     def getHistoryTaskInfo(self):
         '''获取历史签到任务详情'''
+        # 优先使用本地记录的历史签到实例, 没有记录或已失效时再按月查找
+        uuid = self.signTask_.uuid
+        signWid = self.taskInfo['signWid']
+        task = CpdailyTools.getHistoryInstance(uuid, 'wec-counselor-attendance-apps', signWid)
+        if task:
+            try:
+                result = self._loadHistoryTask(task)
+                if result.get('signTime'):
+                    return result
+                LL.log(2, '本地记录的历史签到实例未签到, 将重新查找')
+            except Exception as e:
+                LL.log(2, f'本地记录的历史签到实例获取失败[{e}], 将重新查找')
+        task = self._findHistoryTask()
+        result = self._loadHistoryTask(task)
+        CpdailyTools.setHistoryInstance(
+            uuid, 'wec-counselor-attendance-apps', signWid, task['signInstanceWid'])
+        return result
+
+    def _findHistoryTask(self):
+        '''
+        按月查找和当前任务匹配的最近一次已签到的历史任务
+        :returns dict: 历史任务(含signInstanceWid和signWid)
+        '''
         headers = self.session.headers
         headers['Content-Type'] = 'application/json;charset=UTF-8'
 
@@ -96,61 +116,79 @@ class sleepCheck:
         monthList = [i['id'] for i in res['datas']['rows']]
         monthList.sort(reverse=True)  # 降序排序月份
 
-        # 按月遍历
-        for month in monthList:
+        url = f'{self.host}wec-counselor-attendance-apps/student/attendance/getStuSignInfosByWeekMonth'
+
+        def fetchMonth(month):
             # 获取对应历史月签到情况
             req = {"statisticYearMonth": month}
-            url = f'{self.host}wec-counselor-attendance-apps/student/attendance/getStuSignInfosByWeekMonth'
             res = self.session.post(
                 url, headers=headers, data=json.dumps(req), verify=False)
-            res = res.json()
-            LL.log(1, "获取对应历史月签到情况", res)
-            monthSignList = list(res['datas']['rows'])
-            # 遍历查找历史月中每日的签到情况
-            monthSignList.sort(
-                key=lambda x: x['dayInMonth'], reverse=True)  # 降序排序日信息
-            for daySignList in monthSignList:
-                # 遍历寻找和当前任务匹配的历史已签到任务
-                for task in daySignList['signedTasks']:
-                    if task['signWid'] == self.taskInfo['signWid']:
-                        # 找到和当前任务匹配的历史已签到任务，开始更新表单
-                        historyTaskId = {
-                            "wid": task['signInstanceWid'], "content": task['signWid']}
-                        # 更新cookie
-                        url = f'{self.host}wec-counselor-attendance-apps/student/attendance/getUnSeenQuestion'
-                        self.session.post(url, headers=headers, data=json.dumps(
-                            historyTaskId), verify=False)
-                        # 获取历史任务详情
-                        historyTaskId = {
-                            "signInstanceWid": task['signInstanceWid'], "signWid": task['signWid']}
-                        url = f'{self.host}wec-counselor-attendance-apps/student/attendance/detailSignInstance'
-                        res = self.session.post(
-                            url, headers=headers, data=json.dumps(historyTaskId), verify=False)
-                        res = res.json()
-                        LL.log(1, "获取历史任务详情", res)
-                        # 其他模拟请求
-                        url = f'{self.host}wec-counselor-attendance-apps/student/attendance/getQAconfigration'
-                        self.session.post(url, headers=headers,
-                                          data=json.dumps({}), verify=False)
-                        # 一些数据处理
-                        result = res['datas']
+            return res.json()
 
-                        # 坐标随机
-                        result['longitude'] = float(result['longitude'])
-                        result['latitude'] = float(result['latitude'])
-                        result['longitude'], result['latitude'] = RT.locationOffset(
-                            result['longitude'], result['latitude'], self.userInfo['global_locationOffsetRange'])
-
-                        result['photograph'] = result['photograph'] if len(
-                            result['photograph']) != 0 else ""
-                        # 返回结果
-                        LL.log(1, '历史签到情况的详情', result)
-                        self.historyTaskInfo = result
-                        return result
+        # 按月遍历(从最近的月份开始并发预取, 按顺序检查, 找到后取消其余请求)
+        prefetch = NT.orderedPrefetch(
+            fetchMonth, monthList, self.userInfo['prefetchWindow'])
+        with contextlib.closing(prefetch) as months:
+            for month, res in months:
+                LL.log(1, "获取对应历史月签到情况", res)
+                monthSignList = list(res['datas']['rows'])
+                # 遍历查找历史月中每日的签到情况
+                monthSignList.sort(
+                    key=lambda x: x['dayInMonth'], reverse=True)  # 降序排序日信息
+                for daySignList in monthSignList:
+                    # 遍历寻找和当前任务匹配的历史已签到任务
+                    for task in daySignList['signedTasks']:
+                        if task['signWid'] == self.taskInfo['signWid']:
+                            # 找到和当前任务匹配的历史已签到任务
+                            return task
 
         # 如果没有遍历找到结果
         raise TaskError(f"没有找到匹配的历史任务", 301, self.taskName)
 
+    def _loadHistoryTask(self, task: dict):
+        '''
+        获取历史任务详情
+        :params task: 历史任务(含signInstanceWid和signWid)
+        :returns dict: 处理后的历史任务详情
+        '''
+        headers = self.session.headers
+        headers['Content-Type'] = 'application/json;charset=UTF-8'
+        # 更新cookie
+        historyTaskId = {
+            "wid": task['signInstanceWid'], "content": task['signWid']}
+        url = f'{self.host}wec-counselor-attendance-apps/student/attendance/getUnSeenQuestion'
+        self.session.post(url, headers=headers, data=json.dumps(
+            historyTaskId), verify=False)
+        # 获取历史任务详情
+        historyTaskId = {
+            "signInstanceWid": task['signInstanceWid'], "signWid": task['signWid']}
+        url = f'{self.host}wec-counselor-attendance-apps/student/attendance/detailSignInstance'
+        res = self.session.post(
+            url, headers=headers, data=json.dumps(historyTaskId), verify=False)
+        res = res.json()
+        LL.log(1, "获取历史任务详情", res)
+        if not res.get('datas'):
+            raise Exception(f'获取历史任务详情失败『{res}』')
+        # 其他模拟请求
+        url = f'{self.host}wec-counselor-attendance-apps/student/attendance/getQAconfigration'
+        self.session.post(url, headers=headers,
+                          data=json.dumps({}), verify=False)
+        # 一些数据处理
+        result = res['datas']
+
+        # 坐标随机
+        result['longitude'] = float(result['longitude'])
+        result['latitude'] = float(result['latitude'])
+        result['longitude'], result['latitude'] = RT.locationOffset(
+            result['longitude'], result['latitude'], self.userInfo['global_locationOffsetRange'])
+
+        result['photograph'] = result['photograph'] if len(
+            result['photograph']) != 0 else ""
+        # 返回结果
+        LL.log(1, '历史签到情况的详情', result)
+        self.historyTaskInfo = result
+        return result
+
     # 填充表单
     def fillForm(self):
         LL.log(1, '填充表单')
@@ -265,6 +303,10 @@ class sleepCheck:
         # 检查签到情况
         if self.getDetailTask()['signTime']:
             self.signTask_.code = 101
+            self.signTask_.instanceWid = self.taskInfo['signInstanceWid']
+            CpdailyTools.clearDailyTaskList(self.session, 'wec-counselor-attendance-apps')
+            CpdailyTools.setHistoryInstance(
+                self.signTask_.uuid, 'wec-counselor-attendance-apps', self.taskInfo['signWid'], self.taskInfo['signInstanceWid'])
         else:
             raise TaskError(f'提交表单返回『{res}』且任务状态仍是未签到', 300, self.taskName)
         return '[%s]%s' % (res['message'], self.taskName)
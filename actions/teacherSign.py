@@ -22,14 +22,9 @@ class teacherSign:
     def getUnSignedTasks(self):
         headers = self.session.headers
         headers['Content-Type'] = 'application/json'
-        # 第一次请求接口获取cookies（MOD_AUTH_CAS）
-        url = f'{self.host}wec-counselor-teacher-sign-apps/teacher/sign/getTeacherSignInfosInOneDay'
-        self.session.post(url, headers=headers,
-                          data=json.dumps({}), verify=False)
-        # 第二次请求接口，真正的拿到具体任务
-        res = self.session.post(url, headers=headers,
-                                data=json.dumps({}), verify=False)
-        res = res.json()
+        # 获取当日任务列表(同一用户的多个任务共用, 提交成功或超过probeTTL秒后重新获取)
+        res = CpdailyTools.getDailyTaskList(
+            self.session, self.host, 'wec-counselor-teacher-sign-apps', self.userInfo['probeTTL'])
         if len(res['datas']['unSignedTasks']) < 1:
             raise TaskError('当前暂时没有未签到的任务哦！', 400)
         LL.log(1, '未签到的政工签到', res['datas'])
@@ -135,6 +130,8 @@ class teacherSign:
         # 检查签到情况
         if self.getDetailTask()['signTime']:
             self.signTask_.code = 101
+            self.signTask_.instanceWid = self.taskInfo['signInstanceWid']
+            CpdailyTools.clearDailyTaskList(self.session, 'wec-counselor-teacher-sign-apps')
         else:
             raise TaskError(f'提交表单返回『{res}』且任务状态仍是未签到', 300)
         return res['message']
@@ -1,8 +1,16 @@
 import random
 import traceback
 import os
+import re
+import json
+import time
+import heapq
+import threading
+import itertools
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
-from liteTools import UserDefined, LL, TT, DT, HSF, ST, RT, ProxyGet, TaskError
+from liteTools import UserDefined, LL, TT, DT, HSF, ST, RT, CT, CacheDB, CpdailyTools, ProxyGet, TaskError, reqSession
 from actions.teacherSign import teacherSign
 from actions.workLog import workLog
 from actions.sleepCheck import sleepCheck
@@ -10,11 +18,22 @@ from actions.collection import Collection
 from actions.autoSign import AutoSign
 from actions.sendMessage import SendMessage
 from todayLoginService import TodayLoginService
+from taskCheckpoint import TaskCheckpoint
+from login.ocrService import OcrService
 
 
 class SignTask:
     userSessions = {}
+    runStats = {}  # 运行统计(登录次数等), 见SignTask.countStat
+    _statsLock = threading.Lock()
     codeHeadCounts = 5
+    # 任务类型 -> 任务所属的今日校园应用
+    taskApps = {
+        0: 'wec-counselor-collector-apps',
+        1: 'wec-counselor-sign-apps',
+        2: 'wec-counselor-attendance-apps',
+        4: 'wec-counselor-teacher-sign-apps',
+    }
     statusMsg_lite = {
         0: '待命',
         1: '完成',
@@ -34,20 +53,24 @@ class SignTask:
         400: "没有找到需要执行的任务"
     }
 
-    def __init__(self, userConfig: dict, maxTry: int = 3):
+    def __init__(self, userConfig: dict, maxTry: int = 3, nowTime: float = None):
         '''
         :params userConfig: 用户配置
         :params maxTry: 最大尝试次数
+        :params nowTime: 用于判断任务是否在执行时间的时间戳(默认为脚本启动时间)
         '''
         self.config: dict = userConfig
         self.msg: str = ""
         self.code: int = 0
         self.maxTry: int = int(maxTry)  # 最大触发次数
         self.attempts: int = 0  # 任务触发次数, 当达到最大触发次数, 可能哪怕执行失败也会触发消息推送等
+        self.lastCost: float = 0  # 最近一次执行的耗时(秒)
+        self.instanceWid = None  # 执行的任务实例wid(由actions填入)
+        self.sessionFromCache = False  # 当前使用的登录状态是否来自本地缓存(尚未验证有效)
         self.username = userConfig.get("username", "?username?")
 
         # 检查任务是否在执行时间
-        if TT.isInTimeList(userConfig['taskTimeRange']):
+        if TT.isInTimeList(userConfig['taskTimeRange'], TT.startTime if nowTime is None else nowTime):
             self.code = 0
         else:
             self.code = 201
@@ -62,13 +85,14 @@ class SignTask:
             return
         self.attempts += 1
         LL.log(1, '即将在第%d轮尝试中为[%s]签到' % (self.attempts, self.username))
+        startTime = time.time()
 
         # 执行签到
         try:
             # 执行前准备
             self._beforeExecute()
             # 执行签到任务
-            self._execute()
+            self._executeWithCachedSession()
         except TaskError as e:
             self.code = e.code
             self.msg = str(e)
@@ -80,44 +104,159 @@ class SignTask:
         finally:
             # 收尾工作
             self._afterExecute()
+            self.lastCost = time.time() - startTime
 
     def formatMsg(self, pattern: str = ""):
         return ST.stringFormating(pattern, self.webhook)
 
-    def _login(self):
+    def _login(self, useCache: bool = True):
         '''
         登录, 更新self.session和self.host
+        :params useCache: 是否使用复用的/缓存的登录状态(为False时直接重新登录)
         '''
         LL.log(1, '准备登录')
         uuid = self.uuid
         userSessions = SignTask.userSessions
+        reused = useCache and bool(userSessions.get(uuid))
 
-        if userSessions.get(uuid):
+        if reused:
             LL.log(1, '正在复用登录Session')
             uSession = userSessions[uuid]['session']
             uHost = userSessions[uuid]['host']
+            fromCache = userSessions[uuid]['fromCache']
         else:
-            LL.log(1, '正在尝试进行登录')
             today = TodayLoginService(self.config)
-            today.login()
+            fromCache = useCache and self._loadSessionCache(today)
+            if fromCache:
+                LL.log(1, '正在使用缓存的登录状态')
+            else:
+                LL.log(1, '正在尝试进行登录')
+                today.login()
+                SignTask.countStat('login')
+                self._saveSessionCache(today)
             uSession = today.session
             uHost = today.host
 
+        alive = self._probeSession(uSession, uHost) if reused or fromCache else None
+        if alive is False:
+            # 复用的登录状态已失效, 删除后重新登录
+            LL.log(2, '登录状态已失效, 将重新登录')
+            SignTask.countStat('sessionCacheReject' if fromCache else 'sessionStale')
+            self._dropSessionCache()
+            SignTask.cleanSession(uuid)
+            return self._login(useCache=False)
+        if reused:
+            SignTask.countStat('loginReuse')
+        if alive:
+            # 已验证有效, 执行出错时不再怀疑登录状态失效
+            fromCache = False
+
         userSessions[uuid] = {
-            'session': uSession, 'host': uHost}
+            'session': uSession, 'host': uHost, 'fromCache': fromCache}
         LL.log(1, '登录完成')
         # 更新数据
         self.session = uSession
         self.host = uHost
+        self.sessionFromCache = fromCache
         return
 
-    def _beforeExecute(self):
+    def _probeSession(self, session, host: str):
+        '''
+        检查复用的登录状态在当前任务所属应用中是否有效(结果缓存probeTTL秒, probeTTL为0时不检查)
+        :returns bool|None: 登录状态是否有效, 未检查时返回None
+        '''
+        ttl = self.config['probeTTL']
+        app = SignTask.taskApps.get(self.config.get('type'))
+        if not ttl or not app:
+            return None
+        return CpdailyTools.probeSession(session, host, app, ttl)
+
+    def _executeWithCachedSession(self):
         '''
-        执行前准备工作
+        执行任务, 如果使用的是缓存的登录状态且执行出错(登录状态可能已失效), 则删除缓存, 重新登录后再执行一次
         '''
-        # 随机延迟
-        RT.randomSleep(self.config['delay'])
+        try:
+            self._execute()
+        except TaskError:
+            self._sessionVerified()
+            raise
+        except Exception as e:
+            if not self.sessionFromCache:
+                raise
+            LL.log(2, f'使用缓存的登录状态执行任务出错[{e}], 将重新登录后重试')
+            SignTask.countStat('sessionCacheReject')
+            self._dropSessionCache()
+            SignTask.cleanSession(self.uuid)
+            self._login(useCache=False)
+            self._execute()
+        self._sessionVerified()
 
+    def _sessionVerified(self):
+        '''
+        登录状态已被验证有效(之后的任务出错时不再怀疑缓存失效)
+        '''
+        self.sessionFromCache = False
+        if self.uuid in SignTask.userSessions:
+            SignTask.userSessions[self.uuid]['fromCache'] = False
+
+    @property
+    def _sessionCache(self):
+        '''
+        登录状态缓存(未启用时为None)
+        '''
+        if not self.config['sessionCacheTTL']:
+            return None
+        return CacheDB.open("sessions")
+
+    @property
+    def _sessionCacheKey(self):
+        '''
+        加密登录状态缓存的密钥(由用户名和密码派生, 修改密码后旧缓存自动失效)
+        '''
+        return CT.deriveKey(str(self.config['password']), self.uuid)
+
+    def _loadSessionCache(self, today: TodayLoginService):
+        '''
+        从本地缓存载入登录状态
+        :returns bool: 是否载入成功
+        '''
+        cache = self._sessionCache
+        if not cache:
+            return False
+        data = cache.get(self.uuid)
+        if data:
+            try:
+                today.loadSession(json.loads(CT.decryptGCM(data, self._sessionCacheKey)))
+                SignTask.countStat('sessionCacheHit')
+                return True
+            except (ValueError, KeyError, TypeError) as e:
+                LL.log(2, f'登录状态缓存解析失败[{e}]')
+                cache.delete(self.uuid)
+        SignTask.countStat('sessionCacheMiss')
+        return False
+
+    def _saveSessionCache(self, today: TodayLoginService):
+        '''
+        将登录状态加密保存到本地缓存
+        '''
+        cache = self._sessionCache
+        if not cache:
+            return
+        data = CT.encryptGCM(json.dumps(today.dumpSession()), self._sessionCacheKey)
+        cache.set(self.uuid, data, self.config['sessionCacheTTL'])
+
+    def _dropSessionCache(self):
+        '''
+        删除本地缓存的登录状态
+        '''
+        cache = self._sessionCache
+        if cache:
+            cache.delete(self.uuid)
+
+    def _beforeExecute(self):
+        '''
+        执行前准备工作(任务间的随机延迟由MainHandler在任务入队时安排)
+        '''
         # 用户自定义函数触发
         event = {
             "msg": f"『{self.username}』个人任务即将执行",  # 触发消息
@@ -240,12 +379,27 @@ class SignTask:
         根据用户名和学校给每个用户分配一个uuid。
         用于一个用户有多个任务时, 登录状态的Sesssion复用。
         '''
-        return HSF.strHash(self.config.get('schoolName', '') + self.config.get('username', ''), 256)
+        return SignTask.genUuid(self.config)
+
+    @ staticmethod
+    def genUuid(userConfig: dict):
+        '''
+        根据用户配置中的用户名和学校生成uuid
+        '''
+        return HSF.strHash(userConfig.get('schoolName', '') + userConfig.get('username', ''), 256)
 
     @ property
     def codeHead(self):
         return int(self.code/100)
 
+    @ staticmethod
+    def countStat(key: str, n: int = 1):
+        '''
+        运行统计计数(线程安全)
+        '''
+        with SignTask._statsLock:
+            SignTask.runStats[key] = SignTask.runStats.get(key, 0) + n
+
     @ staticmethod
     def cleanSession(uuid=None):
         '''
@@ -257,6 +411,98 @@ class SignTask:
             SignTask.userSessions.pop(uuid, None)
 
 
+class TaskQueue:
+    '''
+    任务队列: 按任务的可执行时间排序, 同一用户(uuid相同)的任务不会同时执行。
+    执行出错(code为1)且未达到最大尝试次数的任务会按指数退避(带随机抖动)重新入队,
+    退避时间结束后即可再次执行, 不需要等待其他任务。
+    '''
+
+    def __init__(self, tasks: list = (), retryDelay=(10, 300)):
+        '''
+        :params tasks: 任务列表(SignTask), 立即可执行
+        :params retryDelay: 重试的(初始退避时间, 最大退避时间), 单位: 秒
+        '''
+        self.retryDelay = retryDelay
+        self._heap = []  # (可执行时间, 序号, 任务)
+        self._counter = itertools.count()
+        self._busy = set()  # 正在执行任务的uuid
+        self._pending = {}  # uuid: 未结束(等待中或执行中)的任务数
+        self._size = 0  # 未结束的任务数
+        for task in tasks:
+            if task.codeHead == 0:
+                self.push(task)
+
+    def push(self, task, notBefore: float = 0):
+        '''
+        任务入队
+        :params notBefore: 可执行时间(时间戳)
+        '''
+        heapq.heappush(self._heap, (notBefore, next(self._counter), task))
+        self._pending[task.uuid] = self._pending.get(task.uuid, 0) + 1
+        self._size += 1
+
+    def pop(self, now: float = None):
+        '''
+        取出一个可执行的任务(任务出队后, 对应用户被标记为执行中)
+        :returns (task, waitTime): 如果有可执行任务, 返回(任务, 0);
+            否则返回(None, 距离下一个任务可执行的秒数), 如果只能等待执行中的任务结束, 则等待秒数为None
+        '''
+        now = time.time() if now is None else now
+        skipped = []
+        task, waitTime = None, None
+        while self._heap:
+            item = heapq.heappop(self._heap)
+            if item[2].uuid in self._busy:
+                skipped.append(item)
+                continue
+            if item[0] > now:
+                waitTime = item[0] - now
+                skipped.append(item)
+                break
+            task, waitTime = item[2], 0
+            self._busy.add(task.uuid)
+            break
+        for item in skipped:
+            heapq.heappush(self._heap, item)
+        return task, waitTime
+
+    def finish(self, task):
+        '''
+        任务执行结束: 需要重试的任务重新入队
+        :returns released: 该用户是否已没有未结束的任务(可以释放登录Session)
+        '''
+        self._busy.discard(task.uuid)
+        self._pending[task.uuid] -= 1
+        self._size -= 1
+        if task.codeHead == 0 and task.attempts < task.maxTry:
+            delay = self.backoff(task.attempts)
+            LL.log(1, f"[{task.username}]的任务将在{delay:.1f}秒后重试")
+            self.push(task, time.time() + delay)
+            return False
+        if self._pending[task.uuid] == 0:
+            del self._pending[task.uuid]
+            return True
+        return False
+
+    def remaining(self):
+        '''
+        等待中(未出队)的任务列表
+        '''
+        return [item[2] for item in sorted(self._heap)]
+
+    def backoff(self, attempts: int):
+        '''
+        计算第attempts次尝试失败后的退避时间(指数退避+随机抖动)
+        '''
+        base, cap = self.retryDelay
+        delay = min(cap, base * 2 ** (attempts - 1))
+        return random.uniform(delay / 2, delay)
+
+    def __len__(self):
+        return self._size
+
+
 class MainHandler:
     def __init__(self, entranceType: str, event: dict = {}, context: dict = {}):
         '''
@@ -266,6 +512,7 @@ class MainHandler:
         self.entrance: str = entranceType
         self.event: dict = event
         self.context: dict = context
+        self._initTime = time.time()
         # ==========参数初始化==========
         self.geneLogFile = True
         self.configDir = "config.yml"
@@ -278,10 +525,24 @@ class MainHandler:
         elif self.entrance in ("handler", "main_handler"):
             # 如果运行入口是『云函数』(不可写入文件)
             self.geneLogFile = False
+        self.shard = self._getShard()
         # ==========参数初始化==========
         self.config: dict = self.loadConfig()
         self._setMsgOut()
         self._maxTry = self.config['maxTry']
+        self._workers = self._getWorkers()
+        self.cacheDir = self._getCacheDir()
+        CacheDB.defaultDir = self.cacheDir
+        reqSession.poolSize = self.config['poolSize']
+        reqSession.hostLimit = self.config['hostLimit']
+        OcrService.config = self.config.get('captcha') or {}
+        self.checkpoint = TaskCheckpoint.load(self.cacheDir) if self.config['checkpoint'] else None
+        self._timeBudget = self._getTimeBudget()
+        self._deadline = None  # 停止开始新任务的时间戳
+        self._taskCosts = []  # 已观测到的任务耗时
+        self._started = 0  # 本次任务序列已开始执行的任务数
+        self.startTime = TT.startTime  # 本次任务序列的开始时间
+        self._logOffset = 0  # 本次任务序列的日志在LL.msgOut.log中的起始位置
         self.taskList = [SignTask(u, self._maxTry)
                          for u in self.config['users']]
 
@@ -297,24 +558,27 @@ class MainHandler:
         }
         UserDefined.trigger(event, self.webhook)
         LL.log(1, "任务开始执行")
-        maxTry = self._maxTry
-        for tryTimes in range(1, maxTry+1):
-            '''自动重试'''
-            LL.log(1, '正在进行第%d轮尝试' % tryTimes)
-            for task in self.taskList:
-                '''遍历执行任务'''
-                # 执行
-                task.execute()
-                # 清理无用session
-                self._cleanSession(task.uuid)
-            # 清理session池
-            SignTask.cleanSession()
+        SignTask.runStats.clear()
+        self._applyCheckpoint()
+        if self._timeBudget:
+            self._deadline = self._initTime + self._timeBudget - self.config['timeReserve']
+            LL.log(1, f"时间预算{self._timeBudget}秒, 预留{self.config['timeReserve']}秒用于推送")
+        queue = TaskQueue(retryDelay=self.config['retryDelay'])
+        self._started = 0
+        for task, notBefore in self._startSchedule(self._groupByAccount()):
+            queue.push(task, notBefore)
+        self._executeQueue(queue)
+        # 记录因时间不足而未执行的任务
+        self._savePending(queue.remaining())
+        # 清理session池(只清理本次执行的用户, 常驻模式下预热的其他用户的Session保留)
+        for uuid in {task.uuid for task in self.taskList}:
+            SignTask.cleanSession(uuid)
 
         # 签到情况推送
         LL.log(1, self.defaultFormatTitle + "\n" + self.defaultFormatMsg)
         sm = self.sendMsg
-        sm.send(msg=self.defaultFormatMsg, title=self.defaultFormatTitle, attachments=[(LL.msgOut.log.encode(encoding='utf-8'),
-                                                                                        TT.formatStartTime("LOG#t=%Y-%m-%d--%H-%M-%S##.txt"))])
+        sm.send(msg=self.defaultFormatMsg, title=self.defaultFormatTitle, attachments=[(LL.msgOut.log[self._logOffset:].encode(encoding='utf-8'),
+                                                                                        self._logFileName)])
         LL.log(1, '全局推送情况', sm.log_str)
         # 用户自定义函数触发
         event = {
@@ -325,18 +589,352 @@ class MainHandler:
         UserDefined.trigger(event, self.webhook)
         LL.log(1, "==========函数执行完毕==========")
 
+    def daemon(self):
+        '''
+        常驻模式: 根据各用户的taskTimeRange计算执行时间窗口的开始时间,
+        用优先队列按时间顺序等待并执行到期的任务(进程内的缓存在多次执行间保持)
+        '''
+        users = self.config['users']
+        self._timeBudget = None  # 常驻模式不限制执行时间
+        now = time.time()
+        fireQueue = []  # (执行时间, 用户序号)
+        for i, user in enumerate(users):
+            self._scheduleUser(fireQueue, i, TT.nextInTime(user['taskTimeRange'], now))
+        LL.log(1, f"常驻模式启动, 共{len(fireQueue)}个用户等待执行")
+        lead = self.config['warmUpLead']
+        warmed = set()  # 已预热的(执行时间, 用户序号)
+        while fireQueue:
+            fireTime = fireQueue[0][0]
+            LL.log(1, "下一次执行时间: " + time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(fireTime)))
+            if lead and fireQueue[0] not in warmed:
+                # 在执行时间前lead秒预热(登录)即将执行的用户
+                time.sleep(max(0, fireTime - lead - time.time()))
+                soon = [item for item in fireQueue
+                        if item[0] <= time.time() + lead and item not in warmed]
+                warmed.update(soon)
+                self.warmUp([(users[i], t) for t, i in soon])
+            time.sleep(max(0, fireTime - time.time()))
+            # 取出所有到期的用户
+            now = time.time()
+            due = []
+            while fireQueue and fireQueue[0][0] <= now:
+                item = heapq.heappop(fireQueue)
+                warmed.discard(item)
+                due.append(item[1])
+            # 执行
+            self.startTime = now
+            self._logOffset = len(LL.msgOut.log)
+            self.taskList = [SignTask(users[i], self._maxTry, now) for i in due]
+            self.execute()
+            # 释放已推送的日志
+            LL.msgOut.log = ""
+            LL.log_list.clear()
+            for i, task in zip(due, self.taskList):
+                self._scheduleUser(fireQueue, i, self._nextFireTime(task, time.time()))
+        LL.log(1, "没有需要执行的任务, 常驻模式退出")
+
+    def warmUp(self, users: list):
+        '''
+        预热: 在执行时间之前并行登录用户, 登录状态保存在Session池中, 执行任务时直接复用
+        :params users: [(用户配置, 执行时间)]
+        '''
+        tasks = {}
+        for user, fireTime in users:
+            task = SignTask(user, self._maxTry, fireTime)
+            if task.codeHead == 0 and task.uuid not in SignTask.userSessions:
+                tasks.setdefault(task.uuid, task)
+        if not tasks:
+            return
+
+        def login(task: SignTask):
+            try:
+                task._login()
+                return True
+            except Exception as e:
+                LL.log(2, f"[{task.username}]预热登录失败(执行时将重新登录): {e}")
+                return False
+
+        LL.log(1, f"开始预热, 提前登录{len(tasks)}个用户")
+        with ThreadPoolExecutor(max_workers=self._workers) as executor:
+            results = list(executor.map(login, tasks.values()))
+        LL.log(1, f"预热完成, {sum(results)}/{len(results)}个用户登录成功")
+
+    def _nextFireTime(self, task: SignTask, now: float):
+        '''
+        常驻模式下计算用户的下一次执行时间:
+        任务未完成(等待中/出错/没有找到任务)且执行时间窗口在pollInterval秒后仍未结束时, pollInterval秒后再次执行;
+        否则在下一个执行时间窗口开始时执行
+        '''
+        timeRange = task.config['taskTimeRange']
+        poll = self.config['pollInterval']
+        if poll and task.codeHead in (0, 3, 4):
+            windowEnd = TT.windowEnd(timeRange, now)
+            if windowEnd and now + poll < windowEnd:
+                LL.log(1, f"[{task.username}]任务未完成, {poll}秒后再次执行")
+                return now + poll
+        return TT.nextWindowStart(timeRange, now)
+
+    def _scheduleUser(self, fireQueue: list, index: int, fireTime: float):
+        '''
+        将用户的下一次执行时间加入优先队列
+        '''
+        if fireTime is None:
+            LL.log(2, f"用户[{self.config['users'][index]['username']}]在一年内没有执行时间, 不再执行")
+            return
+        heapq.heappush(fireQueue, (fireTime, index))
+
     def formatMsg(self, pattern: str = ""):
         return ST.stringFormating(pattern, self.webhook)
 
-    def _cleanSession(self, uuid: str):
+    def _executeQueue(self, queue: TaskQueue):
         '''
-        登录状态内存释放: 如果同用户还有没有未执行的任务, 则删除session
+        使用线程池执行任务队列(同一用户的任务在前一个任务结束后才会出队, 以复用登录Session)
         '''
-        for i in self.taskList:
-            if i.code == 0 and i.uuid == uuid:
-                break
+        LL.log(1, f"使用{self._workers}个线程执行{len(queue)}个任务")
+        with ThreadPoolExecutor(max_workers=self._workers) as executor:
+            running = {}
+            while queue:
+                # 填满线程池
+                waitTime = None
+                while len(running) < self._workers and self._canStart():
+                    task, waitTime = queue.pop()
+                    if not task:
+                        break
+                    running[executor.submit(task.execute)] = task
+                    self._started += 1
+                if not running:
+                    if not self._canStart(waitTime):
+                        break
+                    time.sleep(waitTime)
+                    continue
+                # 等待任务结束或下一个任务到达可执行时间
+                done, _ = wait(running, timeout=waitTime,
+                               return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = running.pop(future)
+                    future.result()
+                    self._finishTask(queue, task)
+
+    def _applyCheckpoint(self):
+        '''
+        根据任务完成记录, 将本执行时间窗口内已完成的任务直接标记为完成(不再登录和查询)
+        '''
+        if not self.checkpoint:
+            return
+        skipped = 0
+        for task in self.taskList:
+            if task.codeHead != 0:
+                continue
+            record = self.checkpoint.get(task, self.startTime)
+            if record:
+                completedAt = time.strftime("%H:%M:%S", time.localtime(record['completedAt']))
+                task.code = 100
+                task.instanceWid = record['instanceWid']
+                task.msg = f"任务已于{completedAt}完成(根据任务完成记录跳过)"
+                skipped += 1
+        if skipped:
+            LL.log(1, f"根据任务完成记录, {skipped}个任务在本执行时间窗口内已完成")
+
+    def _canStart(self, delay: float = 0):
+        '''
+        根据时间预算判断(在delay秒后)是否还能开始并完成一个新任务
+        '''
+        if not self._deadline:
+            return True
+        costs = self._taskCosts
+        if not costs and not self._started:
+            # 还没有耗时观测值时, 每次运行至少开始一个任务(否则预算小于预估耗时时, 任务永远不会执行)
+            return True
+        estimate = sum(costs) / len(costs) if costs else self.config['taskCostEstimate']
+        return time.time() + (delay or 0) + estimate <= self._deadline
+
+    def _getTimeBudget(self):
+        '''
+        获取本次运行的时间预算(秒), 优先级: 触发事件的timeBudget字段 > 配置文件的timeBudget > 云函数的超时时间
+        :returns budget: float|None
+        '''
+        budget = self._eventDict.get("timeBudget") or self.config['timeBudget']
+        if not budget and self.entrance in ("handler", "main_handler"):
+            context = self.context
+            if isinstance(context, dict):
+                # 腾讯云函数
+                budget = (context.get("time_limit_in_ms") or 0) / 1000
+            else:
+                # 阿里云函数
+                budget = getattr(getattr(context, "function", None), "timeout", None)
+        return float(budget) if budget else None
+
+    def _getCacheDir(self):
+        '''
+        获取缓存文件夹(云函数中使用临时文件夹)
+        '''
+        cacheDir = self.config['cacheDir']
+        if not cacheDir:
+            cacheDir = os.path.join(tempfile.gettempdir(), "ruoli_cache") if self.entrance in (
+                "handler", "main_handler") else "_cache/"
+        try:
+            os.makedirs(cacheDir, exist_ok=True)
+        except OSError as e:
+            LL.log(2, f"缓存文件夹「{cacheDir}」创建失败, 错误信息: [{e}]")
+            cacheDir = tempfile.gettempdir()
+        return cacheDir
+
+    @property
+    def _pendingFile(self):
+        suffix = f"-{self.shard[0]}-{self.shard[1]}" if self.shard else ""
+        return os.path.join(self.cacheDir, f"pendingTasks{suffix}.json")
+
+    def _loadPending(self):
+        '''
+        读取上次运行因时间不足而未执行的用户uuid
+        :returns uuids: set
+        '''
+        try:
+            with open(self._pendingFile, "r", encoding="utf-8") as f:
+                return set(json.load(f).get("uuids", []))
+        except (OSError, ValueError):
+            return set()
+
+    def _savePending(self, tasks: list):
+        '''
+        记录未执行的任务(下次运行时优先执行), 并将其标记为因时间不足未执行
+        '''
+        for task in tasks:
+            task.msg = (task.msg + "\n" if task.msg else "") + "时间预算不足, 未执行完成(下次运行时优先执行)"
+        uuids = list(dict.fromkeys(task.uuid for task in tasks))
+        if uuids:
+            LL.log(2, f"时间预算不足, {len(tasks)}个任务未执行, 已记录")
+        elif not os.path.isfile(self._pendingFile):
+            return
+        try:
+            with open(self._pendingFile, "w", encoding="utf-8") as f:
+                json.dump({"uuids": uuids, "time": time.time()}, f)
+        except OSError as e:
+            LL.log(2, f"未执行任务记录失败, 错误信息: [{e}]")
+
+    def _groupByAccount(self):
+        '''
+        按uuid建立任务索引, 将同一用户的任务排在一起(用户间保持配置中的顺序),
+        使同一用户的任务连续使用同一个登录Session, 最后一个任务结束后立即释放
+        :returns tasks: list[SignTask]
+        '''
+        accounts = {}
+        # 上次运行因时间不足而未执行的用户优先
+        pending = self._loadPending()
+        for task in sorted(self.taskList, key=lambda t: t.uuid not in pending):
+            accounts.setdefault(task.uuid, []).append(task)
+        LL.log(1, f"共{len(self.taskList)}个任务, 属于{len(accounts)}个用户")
+        return list(itertools.chain.from_iterable(accounts.values()))
+
+    def _startSchedule(self, tasks: list):
+        '''
+        安排任务的开始时间: 同一学校的用户之间按配置的delay错开(同一用户的任务共用一个开始时间),
+        不同学校的用户互不影响。等待期间执行器会执行其他已到开始时间的任务, 而不是阻塞等待。
+        :returns schedule: list[(SignTask, 开始时间戳)]
+        '''
+        now = time.time()
+        schoolOffset = {}  # 学校: 该学校下一个用户的开始时间偏移
+        accountStart = {}  # uuid: 开始时间
+        schedule = []
+        for task in tasks:
+            if task.codeHead != 0:
+                continue
+            if task.uuid not in accountStart:
+                school = task.config.get('schoolName', '')
+                offset = schoolOffset.get(school)
+                offset = 0 if offset is None else offset + RT.randomDelay(task.config['delay'])
+                schoolOffset[school] = offset
+                accountStart[task.uuid] = now + offset
+            schedule.append((task, accountStart[task.uuid]))
+        return schedule
+
+    def _finishTask(self, queue: TaskQueue, task: SignTask):
+        '''
+        任务结束后的处理: 重试入队, 以及登录状态内存释放
+        '''
+        self._taskCosts.append(task.lastCost)
+        if self.checkpoint and task.codeHead == 1:
+            self.checkpoint.record(task)
+        released = queue.finish(task)
+        if released or task.codeHead == 0:
+            # 用户没有未执行的任务, 或任务出错等待重试(重试时重新登录)
+            SignTask.cleanSession(task.uuid)
+
+    def _getWorkers(self):
+        '''
+        获取任务并发数(命令行参数优先于配置文件)
+        :returns workers: int
+        '''
+        workers = self.config['concurrency']
+        if self.entrance == "__main__":
+            workers = self.event.get("args", {}).get("workers") or workers
+        try:
+            workers = int(workers)
+        except (TypeError, ValueError):
+            raise Exception(f"任务并发数应为正整数, 而不是『{workers}』")
+        return max(workers, 1)
+
+    def _getShard(self):
+        '''
+        获取任务分片参数(形如"i/n", 代表n个分片中的第i个, i从1开始)
+        本地执行时来自命令行参数--shard, 云函数执行时来自触发事件的shard字段(或定时触发器的附加信息)
+        :returns shard: (i, n)|None
+        '''
+        if self.entrance == "__main__":
+            shard = self.event.get("args", {}).get("shard")
         else:
-            SignTask.cleanSession(uuid)
+            event = self._eventDict
+            shard = event.get("shard")
+            # 腾讯云定时触发器的附加信息在Message字段, 阿里云在payload字段(仅当其为i/n形式时作为分片参数)
+            for key in ("Message", "payload"):
+                if not shard and re.match(r"^\s*\d+\s*/\s*\d+\s*$", str(event.get(key, ""))):
+                    shard = event[key]
+        if not shard:
+            return None
+        match = re.match(r"^\s*(\d+)\s*/\s*(\d+)\s*$", str(shard))
+        if not match:
+            raise Exception(f"分片参数应为「i/n」形式(如1/4), 而不是『{shard}』")
+        index, count = int(match.group(1)), int(match.group(2))
+        if not 1 <= index <= count:
+            raise Exception(f"分片参数『{shard}』错误, 应满足1<=i<=n")
+        LL.log(1, f"当前为第{index}个分片(共{count}个分片)")
+        return (index, count)
+
+    @property
+    def _eventDict(self):
+        '''
+        云函数触发事件(字典形式), 本地执行时为空字典
+        '''
+        if self.entrance == "__main__":
+            return {}
+        event = self.event
+        if isinstance(event, (bytes, str)):
+            # 阿里云函数的event是json字符串
+            try:
+                event = json.loads(event)
+            except ValueError:
+                event = {}
+        return event if isinstance(event, dict) else {}
+
+    def _inShard(self, userConfig: dict):
+        '''
+        判断用户是否属于当前分片(根据用户uuid的哈希值稳定划分)
+        '''
+        if not self.shard:
+            return True
+        index, count = self.shard
+        return int(SignTask.genUuid(userConfig), 16) % count == index - 1
+
+    @property
+    def _shardTag(self):
+        return f"{self.shard[0]}/{self.shard[1]}" if self.shard else ""
+
+    @property
+    def _logFileName(self):
+        if self.shard:
+            return TT.formatStartTime(
+                f"LOG#t=%Y-%m-%d--%H-%M-%S#shard={self.shard[0]}-{self.shard[1]}##.txt")
+        return TT.formatStartTime("LOG#t=%Y-%m-%d--%H-%M-%S##.txt")
 
     def _setMsgOut(self):
         '''
@@ -346,8 +944,7 @@ class MainHandler:
         if self.geneLogFile:
             logDir = self.config.get('logDir')
             if type(logDir) == str:
-                logDir = os.path.join(logDir, TT.formatStartTime(
-                    "LOG#t=%Y-%m-%d--%H-%M-%S##.txt"))
+                logDir = os.path.join(logDir, self._logFileName)
                 LL.msgOut.setFileOut(logDir)
                 return
         else:
@@ -381,12 +978,31 @@ class MainHandler:
         defaultConfig = {
             'delay': (5, 10),
             'locationOffsetRange': 50,
-            "shuffleTask": False
+            "shuffleTask": False,
+            "concurrency": 1,
+            "retryDelay": (10, 300),
+            "cacheDir": None,
+            "timeBudget": None,
+            "timeReserve": 20,
+            "taskCostEstimate": 30,
+            "checkpoint": False,
+            "hostLimit": {"concurrency": 16, "rate": 20},
+            "sessionCacheTTL": 21600,
+            "poolSize": 16,
+            "warmUpLead": 120,
+            "pollInterval": 300,
+            "probeTTL": 60,
+            "pageSize": 20,
+            "prefetchWindow": 4
         }
         defaultConfig.update(config)
         config.update(defaultConfig)
 
         # 用户配置初始化
+        if self.shard:
+            allCount = len(config['users'])
+            config['users'] = [u for u in config['users'] if self._inShard(u)]
+            LL.log(1, f"分片[{self._shardTag}]分配到{len(config['users'])}/{allCount}个任务")
         if config['shuffleTask']:
             LL.log(1, "随机打乱任务列表")
             random.shuffle(config['users'])
@@ -408,7 +1024,11 @@ class MainHandler:
                 'signLevel': 1,
                 'abnormalReason': "回家",
                 'qrUuid': None,
-                'delay': config['delay']
+                'delay': config['delay'],
+                'sessionCacheTTL': config['sessionCacheTTL'],
+                'probeTTL': config['probeTTL'],
+                'pageSize': config['pageSize'],
+                'prefetchWindow': config['prefetchWindow']
             }
             defaultConfig.update(user)
             user.update(defaultConfig)
@@ -431,6 +1051,9 @@ class MainHandler:
     @property
     def webhook(self):
         codecount = self.codeCount
+        stats = SignTask.runStats
+        sessionCacheLookup = stats.get('sessionCacheHit', 0) + stats.get('sessionCacheMiss', 0)
+        sessionCacheHit = stats.get('sessionCacheHit', 0) - stats.get('sessionCacheReject', 0)
         return {
             "taskcount_all": sum(codecount),  # 全部任务数
             "taskcount_todo": codecount[0],  # 待命任务数
@@ -442,8 +1065,14 @@ class MainHandler:
             "taskcount_executed": sum(codecount) - codecount[2],
 
             "scriptVersion": LL.prefix,  # 脚本版本
-            "runTime": TT.formatStartTime(),  # 脚本启动时间(%Y-%m-%d %H:%M:%S格式)
-            "usedTime": TT.executionSeconds(),  # 运行消耗时间(浮点数, 单位:秒)
+            "shard": self._shardTag,  # 任务分片(形如"1/4", 未分片时为空字符串)
+            # 脚本启动时间(%Y-%m-%d %H:%M:%S格式)(常驻模式下为本次执行的开始时间)
+            "runTime": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.startTime)),
+            "usedTime": round(time.time() - self.startTime, 2),  # 运行消耗时间(浮点数, 单位:秒)
+            "login_count": SignTask.runStats.get('login', 0),  # 登录次数
+            "login_saved": SignTask.runStats.get('loginReuse', 0),  # 复用登录状态(节省的登录)次数
+            "sessionCache_hit": sessionCacheHit,  # 登录状态缓存有效次数
+            "sessionCache_rate": round(sessionCacheHit / sessionCacheLookup * 100) if sessionCacheLookup else 0,  # 登录状态缓存命中率(%)
 
             # 一个列表, 包含所有任务的webhook参数
             "taskWebhook": [i.webhook for i in self.taskList],
@@ -451,6 +1080,8 @@ class MainHandler:
 
     @property
     def defaultFormatTitle(self):
+        if self.shard:
+            return self.formatMsg("『全局签到情况({taskcount_done}/{taskcount_executed})[{scriptVersion}][分片{shard}]』")
         return self.formatMsg("『全局签到情况({taskcount_done}/{taskcount_executed})[{scriptVersion}]』")
 
     @property
@@ -462,6 +1093,7 @@ class MainHandler:
         return self.formatMsg("\n".join([
             "\n".join(userMsg),
             "运行于{runTime}, 用时{usedTime}秒",
+            "登录{login_count}次, 复用登录状态{login_saved}次, 登录缓存命中{sessionCache_hit}次({sessionCache_rate}%)",
             "{taskcount_all}任务| {taskcount_todo}待命, {taskcount_done}完成, {taskcount_skip}跳过, {taskcount_error}错误, {taskcount_notFound}缺失"
         ]))
 
@@ -75,8 +75,12 @@ try:
         "login/casLogin",
         "login/iapLogin",
         "login/RSALogin",
+        "login/pageParser",
+        "login/ocrService",
+        "login/localOcr",
         "liteTools",
         "handler",
+        "taskCheckpoint",
         "checkRepositoryVersion",
     ):
         i = os.path.normpath(i)  # 路径适配系统
@@ -120,6 +124,23 @@ local：本地环境，如需使用外部配置文件需要加入该参数
 qinglong: 此参数代表环境为使用青龙面板，加入此参数将不会输出日志到文件，日志请从青龙面板的“日志管理”页面查看"""
         ),
     )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        required=False,
+        help="任务并发数（可选），覆盖配置文件中的concurrency项，同一用户的任务始终按顺序执行",
+    )
+    parser.add_argument(
+        "--shard",
+        required=False,
+        help="任务分片（可选），形如i/n（i从1开始），根据学校+用户名的哈希将用户稳定地分为n份，本进程只执行第i份",
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="常驻模式（可选），脚本不退出，根据各用户的taskTimeRange在执行时间窗口开始时执行任务（不需要再用cron定时运行）",
+    )
     args = vars(parser.parse_args())
     return args
 
@@ -141,4 +162,9 @@ def main_handler(event, context):
 
 if __name__ == "__main__":
     """本地执行入口位置"""
-    MainHandler("__main__", {"args": getCommandArgs()}, {}).execute()
+    args = getCommandArgs()
+    mainHandler = MainHandler("__main__", {"args": args}, {})
+    if args.get("daemon"):
+        mainHandler.daemon()
+    else:
+        mainHandler.execute()
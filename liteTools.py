@@ -1,5 +1,11 @@
 import time
 import traceback
+import threading
+import functools
+import sqlite3
+import contextlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from typing import Sequence
 from io import TextIOWrapper
 import requests
@@ -40,13 +46,123 @@ class reqResponse(requests.Response):
             raise Exception(f"响应内容以json格式解析失败({e})，响应内容:\n\n{self.text}")
 
 
+class HostLimiter:
+    """
+    按host限制同时进行的请求数和请求速率(令牌桶), 同一host的限制器由所有reqSession共享
+    """
+
+    _limiters = {}
+    _conflicts = set()  # 已提示过设置冲突的host
+    _lock = threading.Lock()
+
+    def __init__(self, concurrency: int = None, rate: float = None, burst: int = None):
+        """
+        :params concurrency: 最大同时请求数(为空则不限制)
+        :params rate: 每秒最多发起的请求数(为空则不限制)
+        :params burst: 令牌桶容量, 即允许的瞬时突发请求数(默认与rate相同)
+        """
+        self.limit = {"concurrency": concurrency, "rate": rate, "burst": burst}
+        self.semaphore = threading.BoundedSemaphore(int(concurrency)) if concurrency else None
+        self.rate = float(rate) if rate else None
+        self.capacity = float(burst or max(self.rate or 1, 1))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._bucketLock = threading.Lock()
+
+    def _takeToken(self):
+        """从令牌桶中取出一个令牌(没有令牌时等待)"""
+        if not self.rate:
+            return
+        while True:
+            with self._bucketLock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                waitTime = (1 - self.tokens) / self.rate
+            time.sleep(waitTime)
+
+    def __enter__(self):
+        self._takeToken()
+        if self.semaphore:
+            self.semaphore.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.semaphore:
+            self.semaphore.release()
+
+    @staticmethod
+    def get(host: str, limit: dict):
+        """
+        获取host对应的限制器(不存在时根据limit创建; 已存在时沿用最先创建的设置, 设置不同时提示一次)
+        :params host: 形如"www.example.com"的host
+        :params limit: 形如{"concurrency": 16, "rate": 20}的限制设置
+        :returns HostLimiter
+        """
+        limiter = HostLimiter._limiters.get(host)
+        if not limiter:
+            with HostLimiter._lock:
+                if host not in HostLimiter._limiters:
+                    HostLimiter._limiters[host] = HostLimiter(
+                        limit.get("concurrency"), limit.get("rate"), limit.get("burst")
+                    )
+                    return HostLimiter._limiters[host]
+                limiter = HostLimiter._limiters[host]
+        if host not in HostLimiter._conflicts and any(
+            limit.get(k) != v for k, v in limiter.limit.items()
+        ):
+            HostLimiter._conflicts.add(host)
+            LL.log(
+                2,
+                f"对「{host}」的请求限制设置冲突(已使用{limiter.limit}, 忽略{limit}), "
+                "同一学校的用户应设置相同的hostLimit",
+            )
+        return limiter
+
+
 class reqSession(requests.Session):
     """requests.Session的子类"""
 
-    def request(self, *args, **kwargs):
-        """增添了请求的默认超时时间, 将返回值转换为reqResponse"""
+    hostLimit: dict = None  # 全局的按host请求限制设置(见HostLimiter, 由MainHandler根据配置设置), 为空则不限制
+    schoolLimit: dict = None  # 本session所属学校的请求限制设置(用户配置中的hostLimit), 只用于schoolHosts
+    schoolHosts = frozenset()  # 本session所属学校的服务器(今日校园和统一认证的host)
+    poolSize: int = 16  # 每个host的连接池大小(由MainHandler根据配置设置)
+    _adapters = {}  # 所有reqSession共用的连接池: "scheme://host" -> HTTPAdapter
+    _adaptersLock = threading.Lock()
+
+    def get_adapter(self, url):
+        """同一host的请求共用一个连接池(HTTPAdapter), 复用keep-alive连接; cookies和请求头仍然各session独立"""
+        parsed = parse.urlparse(url)
+        if parsed.scheme not in ("http", "https"):
+            return super(reqSession, self).get_adapter(url)
+        key = f"{parsed.scheme}://{parsed.netloc}".lower()
+        adapter = reqSession._adapters.get(key)
+        if adapter is None:
+            with reqSession._adaptersLock:
+                adapter = reqSession._adapters.get(key)
+                if adapter is None:
+                    adapter = requests.adapters.HTTPAdapter(
+                        pool_connections=1, pool_maxsize=reqSession.poolSize
+                    )
+                    reqSession._adapters[key] = adapter
+        return adapter
+
+    def request(self, method, url, *args, **kwargs):
+        """增添了请求的默认超时时间与按host的请求限制, 将返回值转换为reqResponse"""
         kwargs.setdefault("timeout", (10, 30))
-        res = super(reqSession, self).request(*args, **kwargs)
+        host = parse.urlparse(url).netloc
+        # 学校自己的服务器使用该学校的设置, 多个学校共用的服务器(如今日校园的学校列表接口)使用全局设置
+        limit = self.schoolLimit if self.schoolLimit and host in self.schoolHosts else reqSession.hostLimit
+        if limit:
+            with HostLimiter.get(host, limit):
+                res = super(reqSession, self).request(method, url, *args, **kwargs)
+        else:
+            res = super(reqSession, self).request(method, url, *args, **kwargs)
         return reqResponse(res)
 
 
@@ -59,6 +175,7 @@ class FileOut:
 
     stdout = sys.stdout
     stderr = sys.stderr
+    _lock = threading.RLock()  # 多线程执行任务时, 保证输出不交错
 
     def __init__(self, logPath: str = None):
         """
@@ -112,11 +229,12 @@ class FileOut:
         :print(s)等价于sys.stdout.write(s+"\n")
         """
         str_ = str(str_)
-        self.log += str_
-        if self.logFile:
-            self.logFile.write(str_)
-        FileOut.stdout.write(str_)
-        self.flush()
+        with FileOut._lock:
+            self.log += str_
+            if self.logFile:
+                self.logFile.write(str_)
+            FileOut.stdout.write(str_)
+            self.flush()
 
     def flush(self):
         """刷新缓冲区"""
@@ -201,6 +319,26 @@ class TT:
         :params nowTime: 时间戳
         :return bool: 时间限定字符串是否匹配时间
         """
+        timeRange = TT.parseTimeRange(timeRange)
+        # 将当前时间格式化为"周 月 日 时 分"
+        nowTime = tuple(time.localtime(nowTime))
+        nowTime = (nowTime[6] + 1, nowTime[1], nowTime[2], nowTime[3], nowTime[4])
+        for a, b in zip(nowTime, timeRange):
+            if a not in b:
+                return False
+            else:
+                pass
+        else:
+            return True
+
+    @staticmethod
+    @functools.lru_cache(maxsize=1024)
+    def parseTimeRange(timeRange: str):
+        """
+        解析时间限定字符串(结果会被缓存)
+        :params timeRage: 时间限定字符串(格式见TT.isInTime)
+        :return tuple: 由5个集合组成的元组, 分别是"周 月 日 时 分"的可取值
+        """
         # 判断类型
         if type(timeRange) != str:
             raise TypeError(f"timeRange(时间限定字符串)应该是字符串, 而不是『{type(timeRange)}』")
@@ -222,17 +360,82 @@ class TT:
         timeRange = re.sub(r"(\d*)-(\d*)", formating, timeRange)
         # 将字符串转为二维整数数组
         timeRange = timeRange.split(" ")
-        timeRange = [[int(j) for j in i.split(",")] for i in timeRange]
-        # 将当前时间格式化为"周 月 日 时 分"
-        nowTime = tuple(time.localtime(nowTime))
-        nowTime = (nowTime[6] + 1, nowTime[1], nowTime[2], nowTime[3], nowTime[4])
-        for a, b in zip(nowTime, timeRange):
-            if a not in b:
-                return False
-            else:
-                pass
-        else:
-            return True
+        return tuple(frozenset(int(j) for j in i.split(",")) for i in timeRange)
+
+    @staticmethod
+    def nextInTime(timeRanges, nowTime: float, maxDays: int = 366):
+        """
+        查找时间限定字符串列表匹配的下一个时间点(精确到分钟)
+        :params timeRanges: 时间限定字符串列表(格式见TT.isInTimeList)
+        :params nowTime: 时间戳(如果其所在分钟已经匹配, 则返回该分钟的开始时间)
+        :params maxDays: 最多向后查找的天数
+        :return float|None: 匹配的时间戳, 找不到时返回None
+        """
+        ranges = [TT.parseTimeRange(i) for i in DT.formatStrList(timeRanges)]
+        dt = datetime.datetime.fromtimestamp(nowTime).replace(second=0, microsecond=0)
+        for _ in range(maxDays + 1):
+            # 先按日期筛选, 再按小时、分钟筛选
+            dayRanges = [
+                r
+                for r in ranges
+                if dt.isoweekday() in r[0] and dt.month in r[1] and dt.day in r[2]
+            ]
+            for hour in range(dt.hour, 24):
+                hourRanges = [r for r in dayRanges if hour in r[3]]
+                if not hourRanges:
+                    continue
+                startMinute = dt.minute if hour == dt.hour else 0
+                for minute in range(startMinute, 60):
+                    if any(minute in r[4] for r in hourRanges):
+                        return dt.replace(hour=hour, minute=minute).timestamp()
+            dt = dt.replace(hour=0, minute=0) + datetime.timedelta(days=1)
+        return None
+
+    @staticmethod
+    def nextWindowStart(timeRanges, nowTime: float, maxDays: int = 366):
+        """
+        查找下一个执行时间窗口的开始时间。
+        执行时间窗口是时间限定字符串列表连续匹配的一段时间(跨过0点时视为两个窗口)。
+        :params timeRanges: 时间限定字符串列表(格式见TT.isInTimeList)
+        :params nowTime: 时间戳(如果正处于某个窗口中, 则查找该窗口之后的窗口)
+        :return float|None: 窗口开始的时间戳, 找不到时返回None
+        """
+        windowEnd = TT.windowEnd(timeRanges, nowTime) or nowTime
+        return TT.nextInTime(timeRanges, windowEnd, maxDays)
+
+    @staticmethod
+    def windowStart(timeRanges, nowTime: float):
+        """
+        查找当前所处执行时间窗口的开始时间(窗口定义见TT.nextWindowStart)
+        :params timeRanges: 时间限定字符串列表(格式见TT.isInTimeList)
+        :params nowTime: 时间戳
+        :return float|None: 窗口开始的时间戳, 不在窗口中时返回None
+        """
+        dt = datetime.datetime.fromtimestamp(nowTime).replace(second=0, microsecond=0)
+        if not TT.isInTimeList(timeRanges, dt.timestamp()):
+            return None
+        midnight = dt.replace(hour=0, minute=0)
+        # 向前查找窗口的开始时间(不早于当天开始)
+        while dt > midnight and TT.isInTimeList(timeRanges, (dt - datetime.timedelta(minutes=1)).timestamp()):
+            dt -= datetime.timedelta(minutes=1)
+        return dt.timestamp()
+
+    @staticmethod
+    def windowEnd(timeRanges, nowTime: float):
+        """
+        查找当前所处执行时间窗口的结束时间(窗口定义见TT.nextWindowStart)
+        :params timeRanges: 时间限定字符串列表(格式见TT.isInTimeList)
+        :params nowTime: 时间戳
+        :return float|None: 窗口结束(之后第一个不匹配的分钟)的时间戳, 不在窗口中时返回None
+        """
+        dt = datetime.datetime.fromtimestamp(nowTime).replace(second=0, microsecond=0)
+        if not TT.isInTimeList(timeRanges, dt.timestamp()):
+            return None
+        midnight = dt.replace(hour=0, minute=0) + datetime.timedelta(days=1)
+        # 向后查找窗口的结束时间(不晚于当天结束)
+        while dt < midnight and TT.isInTimeList(timeRanges, dt.timestamp()):
+            dt += datetime.timedelta(minutes=1)
+        return dt.timestamp()
 
     @staticmethod
     def executionSeconds(round_: int = 2):
@@ -280,7 +483,8 @@ class LL:
         logItem = LL.formatLog(logType, args)
         LL.log_list.append(logItem)
         if logType >= LL.printLevel:
-            print(LL.log2FormatStr(logItem))
+            with FileOut._lock:
+                print(LL.log2FormatStr(logItem))
 
     @staticmethod
     def getLog(level=0):
@@ -311,6 +515,135 @@ class CpdailyTools:
     desKey = "XCE927=="
     aesKey = b"SASEoK4Pa5d4SssO"
     aesKey_str = "SASEoK4Pa5d4SssO"
+    # 各应用中用于检查登录状态的轻量接口(POST空json, 登录有效时返回带datas的json)
+    probeApis = {
+        "wec-counselor-collector-apps": "stu/collector/queryCollectorProcessingList",
+        "wec-counselor-sign-apps": "stu/sign/getStuSignInfosInOneDay",
+        "wec-counselor-attendance-apps": "student/attendance/getStuAttendacesInOneDay",
+        "wec-counselor-teacher-sign-apps": "teacher/sign/getTeacherSignInfosInOneDay",
+    }
+
+    # 提供当日任务列表的应用(probeApis中的接口即为当日任务列表)
+    dailyListApps = (
+        "wec-counselor-sign-apps",
+        "wec-counselor-attendance-apps",
+        "wec-counselor-teacher-sign-apps",
+    )
+
+    @staticmethod
+    def probeSession(session, host: str, app: str, ttl: float = 60):
+        """
+        检查登录状态在某个应用中是否有效(结果在session上缓存ttl秒)
+        :params session: 登录后的session
+        :params host: 今日校园host
+        :params app: 应用前缀, 如"wec-counselor-sign-apps"
+        :params ttl: 检查结果的有效时间(秒)
+        :returns bool: 登录状态是否有效
+        """
+        probed = session.__dict__.setdefault("cpdailyProbed", {})
+        if time.time() - probed.get(app, float("-inf")) < ttl:
+            return True
+        # 还没有该应用的cookies(MOD_AUTH_CAS)时, 第一次请求只会获取cookies, 不会返回数据
+        CpdailyTools.primeApp(session, host, app)
+        url = f"{host}{app}/{CpdailyTools.probeApis[app]}"
+        res = session.post(
+            url, headers={"Content-Type": "application/json"}, data=json.dumps({}), verify=False
+        )
+        # 登录失效时会被重定向到登录页面
+        alive = parse.urlparse(res.url).netloc == parse.urlparse(url).netloc
+        if alive:
+            try:
+                data = res.json()
+                alive = isinstance(data, dict) and "datas" in data
+            except Exception:
+                alive = False
+        if alive:
+            probed[app] = time.time()
+            # 检查请求同时也获取了当日任务列表(记录获取时间, 超过有效期后getDailyTaskList会重新获取)
+            if app in CpdailyTools.dailyListApps:
+                session.__dict__.setdefault("cpdailyTaskLists", {})[app] = (time.time(), data)
+        else:
+            probed.pop(app, None)
+            session.__dict__.get("cpdailyApps", set()).discard(app)
+        return alive
+
+    @staticmethod
+    def primeApp(session, host: str, app: str):
+        """
+        第一次请求应用接口以获取该应用的cookies(MOD_AUTH_CAS), 同一session的每个应用只请求一次
+        :params session: 登录后的session
+        :params host: 今日校园host
+        :params app: 应用前缀, 如"wec-counselor-sign-apps"
+        """
+        apps = session.__dict__.setdefault("cpdailyApps", set())
+        if app in apps:
+            return
+        url = f"{host}{app}/{CpdailyTools.probeApis[app]}"
+        session.post(
+            url, headers={"Content-Type": "application/json"}, data=json.dumps({}), verify=False
+        )
+        apps.add(app)
+
+    @staticmethod
+    def getDailyTaskList(session, host: str, app: str, ttl: float = 60):
+        """
+        获取当日任务列表(同一session的每个应用在ttl秒内只请求一次, 同一用户的多个任务共用; 提交成功后用clearDailyTaskList清除)
+        :params session: 登录后的session
+        :params host: 今日校园host
+        :params app: 应用前缀, 见dailyListApps
+        :params ttl: 列表的有效时间(秒), 超过后重新获取(为0则不限制)
+        :returns dict: 接口返回的json
+        """
+        taskLists = session.__dict__.setdefault("cpdailyTaskLists", {})
+        fetchTime = taskLists[app][0] if app in taskLists else None
+        if fetchTime is None or (ttl and time.time() - fetchTime >= ttl):
+            # 第一次请求接口获取cookies(MOD_AUTH_CAS), 第二次请求接口才能拿到具体任务
+            CpdailyTools.primeApp(session, host, app)
+            url = f"{host}{app}/{CpdailyTools.probeApis[app]}"
+            res = session.post(
+                url, headers={"Content-Type": "application/json"}, data=json.dumps({}), verify=False
+            ).json()
+            if "datas" not in res:
+                return res
+            taskLists[app] = (time.time(), res)
+        return taskLists[app][1]
+
+    @staticmethod
+    def clearDailyTaskList(session, app: str):
+        """
+        清除缓存的当日任务列表(任务状态改变后调用)
+        """
+        session.__dict__.get("cpdailyTaskLists", {}).pop(app, None)
+
+    historyIndexTTL = 30 * 86400  # 历史签到记录的有效期(秒)
+
+    @staticmethod
+    def getHistoryInstance(uuid: str, app: str, signWid: str):
+        """
+        查找本地记录的某个签到任务最近一次已签到的实例(供getHistorySign使用, 不必再按月查找)
+        :params uuid: 用户uuid
+        :params app: 应用前缀, 如"wec-counselor-sign-apps"
+        :params signWid: 签到任务wid
+        :returns dict|None: {"signInstanceWid": 实例wid, "signWid": 任务wid}
+        """
+        index = CacheDB.open("history")
+        if not index:
+            return None
+        return index.get(f"{uuid}:{app}:{signWid}")
+
+    @staticmethod
+    def setHistoryInstance(uuid: str, app: str, signWid: str, signInstanceWid: str):
+        """
+        记录某个签到任务最近一次已签到的实例(签到成功或查找到历史签到后调用)
+        """
+        index = CacheDB.open("history")
+        if not index:
+            return
+        index.set(
+            f"{uuid}:{app}:{signWid}",
+            {"signInstanceWid": signInstanceWid, "signWid": signWid},
+            CpdailyTools.historyIndexTTL,
+        )
 
     @staticmethod
     def encrypt_CpdailyExtension(text, key=desKey):
@@ -594,6 +927,38 @@ class NT:
             return 1
         return 0
 
+    @staticmethod
+    def orderedPrefetch(fetch, items, window: int = 4):
+        """
+        并发预取: 同时最多进行window个fetch(item), 结果按items的顺序依次产出。
+        调用方提前结束迭代时(如已找到需要的数据), 取消尚未开始的请求。
+        :params fetch: 获取数据的函数, 参数为items中的一项
+        :params items: 参数序列(按需要的先后顺序排列)
+        :params window: 同时进行的请求数(不超过1时逐个请求)
+        :returns generator: (item, fetch(item))
+        """
+        items = iter(items)
+        if window <= 1:
+            for item in items:
+                yield item, fetch(item)
+            return
+        executor = ThreadPoolExecutor(max_workers=window)
+        futures = deque()
+        try:
+            for item in items:
+                futures.append((item, executor.submit(fetch, item)))
+                if len(futures) < window:
+                    continue
+                item, future = futures.popleft()
+                yield item, future.result()
+            while futures:
+                item, future = futures.popleft()
+                yield item, future.result()
+        finally:
+            for item, future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+
 
 class MT:
     """MiscTools"""
@@ -793,15 +1158,20 @@ class RT:
         raise Exception("图片列表中没有可用图片")
 
     @staticmethod
-    def randomSleep(timeRange: tuple = (5, 7)):
-        """随机暂停一段时间"""
+    def randomDelay(timeRange: tuple = (5, 7)):
+        """生成随机延迟时间(单位: 秒)"""
         if len(timeRange) != 2:
             raise Exception("时间范围应包含开始与结束，列表长度应为2")
         # a = timeRange[0]
         # b = timeRange[1]
         a = 1
         b = 3
-        sleepTime = random.uniform(a, b)
+        return random.uniform(a, b)
+
+    @staticmethod
+    def randomSleep(timeRange: tuple = (5, 7)):
+        """随机暂停一段时间"""
+        sleepTime = RT.randomDelay(timeRange)
         LL.log(0, "程序正在暂停%.3f秒" % sleepTime)
         time.sleep(sleepTime)
 
@@ -885,6 +1255,119 @@ class CT:
         """去掉填充字符"""
         return text[: -ord(text[-1])]
 
+    @staticmethod
+    def deriveKey(secret: str, salt: str, iterations: int = 10000):
+        """
+        由密码等字符串派生AES密钥
+        :returns key: 32字节的密钥
+        """
+        return hashlib.pbkdf2_hmac(
+            "sha256", secret.encode(CT.charset), salt.encode(CT.charset), iterations
+        )
+
+    @staticmethod
+    def encryptGCM(text: str, key: bytes):
+        """
+        AES-GCM加密
+        :returns str: base64编码的 nonce+tag+密文
+        """
+        cipher = AES.new(key, AES.MODE_GCM)
+        ciphertext, tag = cipher.encrypt_and_digest(text.encode(CT.charset))
+        return base64.b64encode(cipher.nonce + tag + ciphertext).decode()
+
+    @staticmethod
+    def decryptGCM(text: str, key: bytes):
+        """
+        AES-GCM解密(密钥错误或内容被篡改时抛出ValueError)
+        :params text: CT.encryptGCM的结果
+        """
+        data = base64.b64decode(text)
+        cipher = AES.new(key, AES.MODE_GCM, nonce=data[:16])
+        return cipher.decrypt_and_verify(data[32:], data[16:32]).decode(CT.charset)
+
+
+class CacheDB:
+    """
+    本地键值缓存(SQLite), 值为可json序列化的对象, 每项有各自的过期时间。
+    同一文件的CacheDB实例由CacheDB.open共享。
+    """
+
+    defaultDir = "_cache/"  # 缓存文件夹(由MainHandler根据配置设置)
+    _instances = {}
+    _lock = threading.Lock()
+
+    def __init__(self, path: str):
+        """
+        :params path: 缓存文件路径
+        """
+        self.path = path
+        self._dbLock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT, expireAt REAL)"
+            )
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """打开数据库连接, 退出时提交并关闭"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str, default=None):
+        """
+        读取缓存(不存在或已过期时返回default)
+        """
+        with self._dbLock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT value, expireAt FROM cache WHERE key=?", (key,)
+            ).fetchone()
+        if not row or row[1] < time.time():
+            return default
+        return json.loads(row[0])
+
+    def set(self, key: str, value, ttl: float):
+        """
+        写入缓存
+        :params ttl: 有效期(秒)
+        """
+        with self._dbLock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache VALUES (?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), time.time() + ttl),
+            )
+
+    def delete(self, key: str):
+        """删除缓存"""
+        with self._dbLock, self._connect() as conn:
+            conn.execute("DELETE FROM cache WHERE key=?", (key,))
+
+    def clean(self):
+        """删除所有过期的缓存"""
+        with self._dbLock, self._connect() as conn:
+            conn.execute("DELETE FROM cache WHERE expireAt<?", (time.time(),))
+
+    @staticmethod
+    def open(name: str):
+        """
+        打开缓存文件夹中的缓存文件, 失败时返回None(缓存不可用不影响任务执行)
+        :params name: 缓存名(文件名为name.db)
+        :returns CacheDB|None
+        """
+        path = os.path.join(CacheDB.defaultDir, name + ".db")
+        with CacheDB._lock:
+            if path not in CacheDB._instances:
+                try:
+                    os.makedirs(CacheDB.defaultDir, exist_ok=True)
+                    CacheDB._instances[path] = CacheDB(path)
+                except (OSError, sqlite3.Error) as e:
+                    LL.log(2, f"缓存「{name}」打开失败, 错误信息: [{e}]")
+                    CacheDB._instances[path] = None
+            return CacheDB._instances[path]
+
 
 class HSF:
     """Hashing String And File"""
@@ -1,8 +1,8 @@
-import re
 import requests
 from bs4 import BeautifulSoup
 from urllib3.exceptions import InsecureRequestWarning
 from login.Utils import Utils
+from login.pageParser import LoginPage
 
 requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
 
@@ -19,28 +19,20 @@ class RSALogin:
     # 登陆方法
     def login(self):
         html = self.session.get(self.login_url, verify=False).text
-        soup = BeautifulSoup(html, 'lxml')
-        form = soup.select('#fm1')
-        if len(form) == 0:
+        page = LoginPage(html)
+        form = page.getForm('fm1')
+        if not form:
             raise Exception('出错啦！网页中没有找到LoginForm')
-        soup = BeautifulSoup(str(form[0]), 'lxml')
         # 填充数据
         params = {}
-        form = soup.select('input')
-        for item in form:
-            if None != item.get('name') and len(item.get('name')) > 0:
-                if item.get('name') != 'rememberMe':
-                    if None == item.get('value'):
-                        params[item.get('name')] = ''
-                    else:
-                        params[item.get('name')] = item.get('value')
+        for item in form['inputs']:
+            if item.get('name') and item.get('name') != 'rememberMe':
+                params[item['name']] = item.get('value', '')
         params['username'] = self.username
-        pattern = 'RSAKeyPair\((.*?)\);'
-        publicKey = re.findall(pattern, html)
-        publicKey = publicKey[0].replace('"', "").split(',')
+        publicKey = page.rsaKey
         params['password'] = Utils.encryptRSA(self.password, publicKey[2],
                                               publicKey[0])
-        if len(soup.select('input#capycha'))!= 0:
+        if page.hasCaptchaInput:
             imgUrl = self.host + 'lyuapServer/captcha.jsp'
             params['captcha'] = Utils.getCodeFromImg(self.session, imgUrl)
         else:
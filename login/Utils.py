@@ -1,21 +1,12 @@
 import base64
-import json
 import random
 from datetime import datetime, timezone, timedelta
-from io import BytesIO
 
 import rsa
 import yaml
 from Crypto.Cipher import AES
-from tencentcloud.common import credential
-from tencentcloud.common.exception.tencent_cloud_sdk_exception import (
-    TencentCloudSDKException,
-)
-from tencentcloud.common.profile.client_profile import ClientProfile
-from tencentcloud.common.profile.http_profile import HttpProfile
-from tencentcloud.ocr.v20181119 import ocr_client, models
 
-from liteTools import DT
+from login.ocrService import OcrService
 
 
 class Utils:
@@ -117,40 +108,7 @@ class Utils:
     # 通过url解析图片验证码
     @staticmethod
     def getCodeFromImg(res, imgUrl):
-        response = res.get(imgUrl, verify=False)  # 将这个图片保存在内存
-        # 得到这个图片的base64编码
-        imgCode = str(
-            base64.b64encode(BytesIO(response.content).read()), encoding="utf-8"
-        )
-        # print(imgCode)
-        try:
-            config = DT.loadYml("config.yml")
-            captchaLen = config["captcha"]["captchaLen"]
-            cred = credential.Credential(
-                config["captcha"]["tencentSecretId"],
-                config["captcha"]["tencentSecretKey"],
-            )
-            httpProfile = HttpProfile()
-            httpProfile.endpoint = "ocr.tencentcloudapi.com"
-
-            clientProfile = ClientProfile()
-            clientProfile.httpProfile = httpProfile
-            client = ocr_client.OcrClient(cred, "ap-beijing", clientProfile)
-
-            req = models.GeneralBasicOCRRequest()
-            params = {"ImageBase64": imgCode}
-            req.from_json_string(json.dumps(params))
-            resp = client.GeneralBasicOCR(req)
-            codeArray = json.loads(resp.to_json_string())["TextDetections"]
-            code = ""
-            for item in codeArray:
-                code += item["DetectedText"].replace(" ", "")
-            if len(code) == captchaLen:
-                return code
-            else:
-                return Utils.getCodeFromImg(res, imgUrl)
-        except TencentCloudSDKException as err:
-            raise Exception("验证码识别出现问题了" + str(err.message))
+        return OcrService.get().recognize(res, imgUrl)
 
     @staticmethod
     def getUserAgents():
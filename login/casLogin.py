@@ -3,6 +3,7 @@ import requests
 from bs4 import BeautifulSoup
 from urllib3.exceptions import InsecureRequestWarning
 from login.Utils import Utils
+from login.pageParser import LoginPage
 from liteTools import Image
 
 requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
@@ -64,58 +65,25 @@ class casLogin:
             imgUrl = self.host + "authserver/getCaptcha.htl"
             params["captcha"] = Utils.getCodeFromImg(self.session, imgUrl)
 
+    def analysePage(self, html):
+        """
+        分析登录页面, 得到表单类型、验证码类型、需要提交的参数和salt
+        :returns (params, salt)
+        """
+        page = LoginPage(html)
+        self.formType = ""
+        for i in ("casLoginForm", "loginFromId", "fm1"):
+            if i in page.formIds:
+                self.formType = i
+                break
+        self.captcha_type = "slider" if page.hasSliderCaptcha else "code"
+        return page.fields(), page.salt
+
     def login(self):
         html = self.session.get(self.login_url, verify=False).text
-        if re.findall('<form[^<]*id="casLoginForm"[^>]*>', html, re.I):
-            self.formType = "casLoginForm"
-        elif re.findall('<form[^<]*id="loginFromId"[^>]*>', html, re.I):
-            self.formType = "loginFromId"
-        elif re.findall('<form[^<]*id="fm1"[^>]*>', html, re.I):
-            self.formType = "fm1"
-        # 在html中寻找所有form元素(备注: form几乎不会嵌套form)
-        formElementList = re.findall(r"<form[\s\S]*?</form>", html)
-        # 初始化需要的参数
-        params = {}
-        salt = ""
-        # 寻找包含"password"的form元素
-        for form in formElementList:
-            if re.findall("password", form, re.I):
-                # 在input元素中，查找salt和一些需要提交参数
-
-                inputElementList = re.findall(r"<input[\s\S]*?>", form)
-                for inputElement in inputElementList:
-                    # 查找salt
-                    if re.findall(r"EncryptSalt", inputElement, re.I):
-                        salt = re.findall(r'value="(.*?)"', inputElement)[0]
-                    # 排除type为非文本类型input元素
-                    if re.findall(
-                        r'type="(?:button|checkbox|file|image|radio|reset|submit)"',
-                        inputElement,
-                    ):
-                        continue
-                    # 查找需要提交的数据的键
-                    if re.findall(r"name=", inputElement):
-                        key = re.findall(r'name="(.*?)"', inputElement)[0]
-                    else:
-                        continue
-                    # 查找需要提交的数据的值
-                    if re.findall(r"value=", inputElement):
-                        value = re.findall(r'value="(.*?)"', inputElement)[0]
-                    else:
-                        value = ""
-                    # 填入即将提交的参数字典中
-                    params[key] = value
-        if not salt:
-            """salt可能藏在script中"""
-            maySalt = re.findall(r'var pwdDefaultEncryptSalt ?= ?"(.*?)"', html)
-            if maySalt:
-                salt = maySalt[0]
+        params, salt = self.analysePage(html)
         # 将用户名填入即将提交的参数中
         params["username"] = self.username
-        # 检查验证码类型
-        self.captcha_type = "code"
-        if re.findall("sliderCaptchaDiv", html):
-            self.captcha_type = "slider"
         # 将密码填入即将提交的参数中
         if salt:
             params["password"] = Utils.encryptAES(self.password, salt)
@@ -9,6 +9,7 @@ from tencentcloud.common.exception.tencent_cloud_sdk_exception import TencentClo
 from tencentcloud.ocr.v20181119 import ocr_client, models
 from urllib3.exceptions import InsecureRequestWarning
 from login.Utils import Utils
+from login.ocrService import OcrService
 
 requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
 
@@ -53,6 +54,8 @@ class iapLogin:
             data = data.json()
             self.count += 1
             if data['resultCode'] == 'CAPTCHA_NOTMATCH':
+                # 识别结果错误, 不再使用缓存的该结果
+                OcrService.get().forget(params['captcha'])
                 if self.count < 10:
                     self.login()
                 else:
@@ -0,0 +1,200 @@
+import os
+import re
+import time
+from io import BytesIO
+
+import numpy as np
+import PIL.Image as PIL_Image
+
+# 字符图像统一缩放的大小
+GLYPH_SIZE = (16, 16)
+DEFAULT_GLYPH_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "captchaGlyphs.npz")
+
+
+class LocalRecognizer:
+    """
+    本地字符验证码识别(NumPy实现, 不需要联网)。
+    先二值化并按列投影切分出单个字符, 再与字符模板库做最近邻匹配。
+    字符模板库由已标注的验证码图片生成(见本文件的命令行用法)。
+    """
+
+    def __init__(self, glyphFile: str = DEFAULT_GLYPH_FILE):
+        """
+        :params glyphFile: 字符模板库文件(.npz)
+        """
+        data = np.load(glyphFile)
+        self.templates = data["templates"].astype(np.float32)  # (N, 16*16), 每行已归一化
+        self.labels = data["labels"]  # (N,)
+
+    @staticmethod
+    def binarize(img: bytes):
+        """
+        将验证码图片转为二值图像(字符为True)
+        :returns np.ndarray: 二维bool数组
+        """
+        gray = np.asarray(PIL_Image.open(BytesIO(img)).convert("L"), dtype=np.float32)
+        # 大津法求阈值
+        hist = np.bincount(gray.astype(np.uint8).ravel(), minlength=256).astype(np.float64)
+        levels = np.arange(256)
+        weight = np.cumsum(hist)
+        mean = np.cumsum(hist * levels)
+        total = weight[-1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            between = (mean[-1] * weight - mean * total) ** 2 / (weight * (total - weight))
+        threshold = np.nanargmax(between)
+        binary = gray <= threshold
+        # 字符应该是少数像素, 否则说明是浅色字符深色背景
+        if binary.mean() > 0.5:
+            binary = ~binary
+        # 去除孤立的噪点(上下左右都没有相邻的字符像素)
+        padded = np.pad(binary, 1)
+        neighbours = (
+            padded[:-2, 1:-1].astype(np.int8)
+            + padded[2:, 1:-1]
+            + padded[1:-1, :-2]
+            + padded[1:-1, 2:]
+        )
+        return binary & (neighbours > 0)
+
+    @staticmethod
+    def segment(binary: np.ndarray, count: int = 0):
+        """
+        按列投影切分字符
+        :params binary: 二值图像
+        :params count: 字符数(已知时用于合并/拆分字符块)
+        :returns list[np.ndarray]: 各个字符的二值图像
+        """
+        columns = binary.sum(axis=0)
+        # 找出连续的有字符像素的列
+        spans = []
+        start = None
+        for x, n in enumerate(columns):
+            if n and start is None:
+                start = x
+            elif not n and start is not None:
+                spans.append([start, x])
+                start = None
+        if start is not None:
+            spans.append([start, len(columns)])
+        # 去掉过小的块(残留噪点)
+        spans = [s for s in spans if binary[:, s[0]:s[1]].sum() > 4] or spans
+        if count:
+            # 块过多时, 合并间隔最小的相邻块
+            while len(spans) > count:
+                gaps = [spans[i + 1][0] - spans[i][1] for i in range(len(spans) - 1)]
+                i = int(np.argmin(gaps))
+                spans[i: i + 2] = [[spans[i][0], spans[i + 1][1]]]
+            # 块过少时, 平分最宽的块(粘连的字符)
+            while spans and len(spans) < count:
+                i = int(np.argmax([s[1] - s[0] for s in spans]))
+                a, b = spans[i]
+                if b - a < 2:
+                    break
+                spans[i: i + 1] = [[a, (a + b) // 2], [(a + b) // 2, b]]
+        glyphs = []
+        for a, b in spans:
+            glyph = binary[:, a:b]
+            rows = np.nonzero(glyph.any(axis=1))[0]
+            if len(rows):
+                glyph = glyph[rows[0]: rows[-1] + 1]
+            glyphs.append(glyph)
+        return glyphs
+
+    @staticmethod
+    def vectorize(glyph: np.ndarray):
+        """
+        将字符图像缩放为固定大小并展开为归一化的向量
+        """
+        img = PIL_Image.fromarray(glyph.astype(np.uint8) * 255).resize(GLYPH_SIZE, PIL_Image.BILINEAR)
+        vector = np.asarray(img, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    @staticmethod
+    def glyphVectors(img: bytes, count: int = 0):
+        """
+        切分验证码图片并得到各字符的向量
+        :returns np.ndarray: (字符数, 16*16)
+        """
+        glyphs = LocalRecognizer.segment(LocalRecognizer.binarize(img), count)
+        if not glyphs:
+            return np.zeros((0, GLYPH_SIZE[0] * GLYPH_SIZE[1]), dtype=np.float32)
+        return np.stack([LocalRecognizer.vectorize(g) for g in glyphs])
+
+    def recognize(self, img: bytes, count: int = 0):
+        """
+        识别验证码
+        :params count: 验证码长度(为0则不限制)
+        :returns (code, score): 识别结果和最低的字符匹配度(余弦相似度, 0~1)
+        """
+        vectors = LocalRecognizer.glyphVectors(img, count)
+        if not len(vectors):
+            return "", 0.0
+        similarity = vectors @ self.templates.T
+        best = similarity.argmax(axis=1)
+        code = "".join(str(i) for i in self.labels[best])
+        score = float(similarity[np.arange(len(best)), best].min())
+        return code, score
+
+    @staticmethod
+    def build(corpusDir: str, glyphFile: str = DEFAULT_GLYPH_FILE):
+        """
+        由已标注的验证码图片生成字符模板库
+        :params corpusDir: 验证码图片文件夹, 文件名(第一个"_"或"."之前的部分)即验证码内容, 如"ab3d_1.png"
+        :returns (图片数, 字符模板数)
+        """
+        templates = []
+        labels = []
+        images = 0
+        for name, label, img in loadCorpus(corpusDir):
+            vectors = LocalRecognizer.glyphVectors(img, len(label))
+            if len(vectors) != len(label):
+                continue
+            images += 1
+            templates.extend(vectors)
+            labels.extend(label)
+        np.savez_compressed(
+            glyphFile, templates=np.stack(templates), labels=np.array(labels)
+        )
+        return images, len(templates)
+
+
+def loadCorpus(corpusDir: str):
+    """
+    读取已标注的验证码图片
+    :returns [(文件名, 验证码内容, 图片内容)]
+    """
+    corpus = []
+    for name in sorted(os.listdir(corpusDir)):
+        if not re.search(r"\.(png|jpe?g|gif|bmp)$", name, re.I):
+            continue
+        label = re.split(r"[_.]", name)[0]
+        with open(os.path.join(corpusDir, name), "rb") as f:
+            corpus.append((name, label, f.read()))
+    return corpus
+
+
+if __name__ == "__main__":
+    # 生成字符模板库: python -m login.localOcr build 验证码图片文件夹 [模板库文件]
+    # 测试准确率和速度: python -m login.localOcr bench 验证码图片文件夹 [模板库文件]
+    import argparse
+
+    parser = argparse.ArgumentParser(description="本地验证码识别")
+    parser.add_argument("action", choices=("build", "bench"))
+    parser.add_argument("corpusDir", help="已标注的验证码图片文件夹(文件名即验证码内容, 如ab3d_1.png)")
+    parser.add_argument("glyphFile", nargs="?", default=DEFAULT_GLYPH_FILE, help="字符模板库文件")
+    args = parser.parse_args()
+    if args.action == "build":
+        images, glyphs = LocalRecognizer.build(args.corpusDir, args.glyphFile)
+        print(f"使用{images}张图片生成了{glyphs}个字符模板, 已保存到{args.glyphFile}")
+    else:
+        recognizer = LocalRecognizer(args.glyphFile)
+        corpus = loadCorpus(args.corpusDir)
+        correct = 0
+        start = time.perf_counter()
+        for name, label, img in corpus:
+            code, score = recognizer.recognize(img, len(label))
+            correct += code.lower() == label.lower()
+        cost = time.perf_counter() - start
+        print(f"共{len(corpus)}张图片, 准确率{correct / max(len(corpus), 1):.2%}, "
+              f"平均每张{cost / max(len(corpus), 1) * 1000:.2f}ms")
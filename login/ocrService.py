@@ -0,0 +1,204 @@
+import base64
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from tencentcloud.common import credential
+from tencentcloud.common.exception.tencent_cloud_sdk_exception import (
+    TencentCloudSDKException,
+)
+from tencentcloud.common.profile.client_profile import ClientProfile
+from tencentcloud.common.profile.http_profile import HttpProfile
+from tencentcloud.ocr.v20181119 import ocr_client, models
+
+from liteTools import DT, LL
+from login.localOcr import LocalRecognizer, DEFAULT_GLYPH_FILE
+
+
+class OcrBackend:
+    """
+    验证码识别后端接口。
+    子类需要设置name并实现recognize, 然后用OcrService.register注册。
+    """
+
+    name = ""
+
+    def __init__(self, config: dict):
+        """
+        :params config: 配置文件中的captcha项
+        """
+        self.config = config
+
+    def available(self):
+        """后端是否可用(比如是否填写了密钥)"""
+        return True
+
+    def recognize(self, img: bytes):
+        """
+        识别验证码图片
+        :params img: 图片内容
+        :returns str: 识别结果
+        """
+        raise NotImplementedError
+
+
+class OcrService:
+    """
+    验证码识别服务(每个进程只创建一次)。
+    按顺序尝试配置的后端, 识别结果按图片哈希缓存(相同的验证码图片不会重复识别)。
+    """
+
+    config: dict = None  # 配置文件中的captcha项(由MainHandler设置, 为空时读取config.yml)
+    backends = {}  # 已注册的后端: name -> OcrBackend子类
+    cacheSize = 1024
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self, config: dict):
+        self.captchaLen = int(config.get("captchaLen") or 0)
+        self.maxTry = int(config.get("maxTry") or 5)
+        # 本地识别没有自带字符模板库, 需要用户自行生成后在backends中启用
+        names = config.get("backends") or ["tencent"]
+        self.chain = []
+        for name in DT.formatStrList(names):
+            if name not in OcrService.backends:
+                LL.log(2, f"未知的验证码识别方式「{name}」")
+                continue
+            backend = OcrService.backends[name](config)
+            if backend.available():
+                self.chain.append(backend)
+        self._cache = OrderedDict()  # 图片哈希 -> 识别结果
+        self._cacheLock = threading.Lock()
+
+    @staticmethod
+    def register(backend):
+        """注册识别后端(可作为类装饰器使用)"""
+        OcrService.backends[backend.name] = backend
+        return backend
+
+    @staticmethod
+    def get():
+        """
+        获取识别服务(第一次调用时创建)
+        :returns OcrService
+        """
+        with OcrService._lock:
+            if OcrService._instance is None:
+                config = OcrService.config
+                if config is None:
+                    config = DT.loadYml("config.yml").get("captcha") or {}
+                OcrService._instance = OcrService(config)
+            return OcrService._instance
+
+    def recognizeImage(self, img: bytes):
+        """
+        识别验证码图片(依次尝试各个后端)
+        :returns str|None: 长度正确的识别结果, 全部失败时返回None
+        """
+        imgHash = hashlib.sha1(img).hexdigest()
+        with self._cacheLock:
+            if imgHash in self._cache:
+                self._cache.move_to_end(imgHash)
+                return self._cache[imgHash]
+        for backend in self.chain:
+            try:
+                code = backend.recognize(img)
+            except Exception as e:
+                LL.log(2, f"验证码识别({backend.name})出错: {e}")
+                continue
+            if code and (not self.captchaLen or len(code) == self.captchaLen):
+                with self._cacheLock:
+                    self._cache[imgHash] = code
+                    if len(self._cache) > OcrService.cacheSize:
+                        self._cache.popitem(last=False)
+                return code
+            LL.log(1, f"验证码识别({backend.name})结果「{code}」长度不正确")
+        return None
+
+    def recognize(self, session, imgUrl: str):
+        """
+        获取并识别验证码(识别失败时重新获取验证码, 最多尝试maxTry次)
+        :params session: 获取验证码所用的session
+        :params imgUrl: 验证码图片地址
+        :returns str: 识别结果
+        """
+        if not self.chain:
+            raise Exception("需要识别验证码, 但没有可用的验证码识别方式, 请检查配置文件中的captcha项")
+        for _ in range(self.maxTry):
+            img = session.get(imgUrl, verify=False).content
+            code = self.recognizeImage(img)
+            if code:
+                return code
+        raise Exception(f"验证码识别失败(已尝试{self.maxTry}次)")
+
+    def forget(self, code: str):
+        """
+        删除缓存中的错误识别结果(验证码被服务器判定为错误时调用)
+        """
+        with self._cacheLock:
+            for imgHash in [k for k, v in self._cache.items() if v == code]:
+                del self._cache[imgHash]
+
+
+@OcrService.register
+class TencentOcrBackend(OcrBackend):
+    """腾讯云通用印刷体识别"""
+
+    name = "tencent"
+
+    def __init__(self, config: dict):
+        super().__init__(config)
+        self._client = None
+
+    def available(self):
+        return bool(self.config.get("tencentSecretId") and self.config.get("tencentSecretKey"))
+
+    @property
+    def client(self):
+        """OCR客户端(第一次使用时创建)"""
+        if self._client is None:
+            cred = credential.Credential(
+                self.config["tencentSecretId"], self.config["tencentSecretKey"]
+            )
+            httpProfile = HttpProfile()
+            httpProfile.endpoint = "ocr.tencentcloudapi.com"
+            clientProfile = ClientProfile()
+            clientProfile.httpProfile = httpProfile
+            self._client = ocr_client.OcrClient(cred, "ap-beijing", clientProfile)
+        return self._client
+
+    def recognize(self, img: bytes):
+        req = models.GeneralBasicOCRRequest()
+        req.from_json_string(json.dumps({"ImageBase64": base64.b64encode(img).decode()}))
+        try:
+            resp = self.client.GeneralBasicOCR(req)
+        except TencentCloudSDKException as err:
+            raise Exception("验证码识别出现问题了" + str(err.message))
+        codeArray = json.loads(resp.to_json_string())["TextDetections"]
+        return "".join(item["DetectedText"].replace(" ", "") for item in codeArray)
+
+
+@OcrService.register
+class LocalOcrBackend(OcrBackend):
+    """本地识别(见login/localOcr.py), 匹配度低于localMinScore时交给下一个识别方式"""
+
+    name = "local"
+
+    def __init__(self, config: dict):
+        super().__init__(config)
+        self.glyphFile = config.get("glyphFile") or DEFAULT_GLYPH_FILE
+        self.minScore = float(config.get("localMinScore") or 0.8)
+        self.captchaLen = int(config.get("captchaLen") or 0)
+        self._recognizer = LocalRecognizer(self.glyphFile) if self.available() else None
+
+    def available(self):
+        return os.path.isfile(self.glyphFile)
+
+    def recognize(self, img: bytes):
+        code, score = self._recognizer.recognize(img, self.captchaLen)
+        if score < self.minScore:
+            LL.log(1, f"本地验证码识别结果「{code}」匹配度({score:.2f})过低")
+            return None
+        return code
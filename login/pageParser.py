@@ -0,0 +1,167 @@
+import re
+from html import unescape
+
+# 不需要提交的input类型
+NON_TEXT_TYPES = {"button", "checkbox", "file", "image", "radio", "reset", "submit"}
+# 表单及其中的input标签(以字面量"<form"/"<input"开头, 可以快速定位)
+FORM_RE = re.compile(r"<form\b([^>]*)>(.*?)</form>", re.S)
+INPUT_RE = re.compile(r"<input\b([^>]*)>")
+ATTR_RE = re.compile(r"""([\w:-]+)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))""")
+SCRIPT_SALT_RE = re.compile(r'var pwdDefaultEncryptSalt ?= ?"(.*?)"')
+RSA_KEY_RE = re.compile(r"RSAKeyPair\((.*?)\);")
+
+
+def parseAttrs(attrText: str):
+    """
+    解析标签属性
+    :returns dict: 属性名(小写) -> 属性值
+    """
+    attrs = {}
+    for m in ATTR_RE.finditer(attrText):
+        value = m.group(2) if m.group(2) is not None else (m.group(3) if m.group(3) is not None else m.group(4))
+        attrs[m.group(1).lower()] = unescape(value) if "&" in value else value
+    return attrs
+
+
+class LoginPage:
+    """
+    登录页面解析(预编译正则扫描一次得到表单、salt、RSA公钥和验证码等信息), 供casLogin和RSALogin使用
+    """
+
+    def __init__(self, html: str):
+        """
+        :params html: 登录页面html
+        """
+        self.html = html
+        # 页面中的表单, 每项形如{"id": 表单id, "inputs": [input属性字典], "hasPassword": 是否为密码表单}
+        self.forms = []
+        hasCaptchaInput = False
+        for formMatch in FORM_RE.finditer(html):
+            form = {"id": parseAttrs(formMatch.group(1)).get("id", ""), "inputs": [], "hasPassword": False}
+            self.forms.append(form)
+            for inputMatch in INPUT_RE.finditer(formMatch.group(2)):
+                attrs = parseAttrs(inputMatch.group(1))
+                form["inputs"].append(attrs)
+                if attrs.get("id") == "capycha":
+                    hasCaptchaInput = True
+                if any("password" in v.lower() for v in attrs.values()):
+                    form["hasPassword"] = True
+        # 查找salt(在密码表单的input中)
+        salt = ""
+        for form in self.forms:
+            if not form["hasPassword"]:
+                continue
+            for i in form["inputs"]:
+                if "encryptsalt" in i.get("id", "").lower() or "encryptsalt" in i.get("name", "").lower():
+                    salt = i.get("value", "")
+        if not salt:
+            # salt可能藏在script中
+            maySalt = SCRIPT_SALT_RE.search(html)
+            if maySalt:
+                salt = maySalt.group(1)
+        self.salt = salt
+        self.hasCaptchaInput = hasCaptchaInput  # 是否有验证码输入框(input#capycha)
+        self.hasSliderCaptcha = "sliderCaptchaDiv" in html  # 是否为滑块验证码
+        # RSA公钥参数(RSAKeyPair的参数列表)
+        rsaKey = RSA_KEY_RE.search(html)
+        self.rsaKey = rsaKey.group(1).replace('"', "").split(",") if rsaKey else None
+
+    @property
+    def formIds(self):
+        """页面中所有表单的id"""
+        return [form["id"] for form in self.forms]
+
+    def getForm(self, formId: str):
+        """
+        根据id查找表单
+        :returns dict|None
+        """
+        for form in self.forms:
+            if form["id"] == formId:
+                return form
+        return None
+
+    def fields(self, form: dict = None):
+        """
+        需要提交的表单参数(跳过按钮、复选框等非文本类型的input)
+        :params form: 表单(为空则合并所有密码表单的参数)
+        :returns dict: 参数名 -> 默认值
+        """
+        forms = [form] if form else [f for f in self.forms if f["hasPassword"]]
+        params = {}
+        for f in forms:
+            for i in f["inputs"]:
+                if i.get("type", "").lower() in NON_TEXT_TYPES or not i.get("name"):
+                    continue
+                params[i["name"]] = i.get("value", "")
+        return params
+
+
+if __name__ == "__main__":
+    # 性能测试: python -m login.pageParser [保存的登录页面所在文件夹]
+    import os
+    import sys
+    import timeit
+    from bs4 import BeautifulSoup
+
+    def regexParse(html):
+        """旧版casLogin的解析方式(多次未编译的正则)"""
+        params = {}
+        for form in re.findall(r"<form[\s\S]*?</form>", html):
+            if re.findall("password", form, re.I):
+                for inputElement in re.findall(r"<input[\s\S]*?>", form):
+                    if re.findall(
+                        r'type="(?:button|checkbox|file|image|radio|reset|submit)"',
+                        inputElement,
+                    ):
+                        continue
+                    if re.findall(r"name=", inputElement):
+                        key = re.findall(r'name="(.*?)"', inputElement)[0]
+                    else:
+                        continue
+                    value = re.findall(r'value="(.*?)"', inputElement)
+                    params[key] = value[0] if value else ""
+        re.findall(r'var pwdDefaultEncryptSalt ?= ?"(.*?)"', html)
+        re.findall("sliderCaptchaDiv", html)
+        return params
+
+    def soupParse(html):
+        """旧版RSALogin的解析方式(两次BeautifulSoup)"""
+        soup = BeautifulSoup(html, "lxml")
+        form = soup.select("form")
+        soup = BeautifulSoup(str(form[0]) if form else "", "lxml")
+        params = {i.get("name"): i.get("value") or "" for i in soup.select("input")}
+        re.findall(r"RSAKeyPair\((.*?)\);", html)
+        return params
+
+    pages = []
+    if len(sys.argv) > 1:
+        for name in sorted(os.listdir(sys.argv[1])):
+            if name.endswith((".html", ".htm")):
+                with open(os.path.join(sys.argv[1], name), encoding="utf-8") as f:
+                    pages.append(f.read())
+    if not pages:
+        # 没有提供页面时, 使用一个模拟的统一身份认证登录页面
+        inputs = "".join(
+            f'<input type="hidden" name="field{i}" value="value{i}">' for i in range(20)
+        )
+        pages.append(
+            "<html><head>" + "<script>var a = 1;</script>" * 50 + "</head><body>"
+            '<form id="pwdFromId" method="post">'
+            '<input id="username" name="username" type="text">'
+            '<input id="password" name="password" type="password">'
+            '<input type="hidden" id="pwdEncryptSalt" value="0123456789abcdef">'
+            f'{inputs}<input type="checkbox" name="rememberMe" value="true"></form>'
+            '<form id="phoneFromId"><input name="dynamicCode"></form>'
+            + "<div><p>text</p></div>" * 500
+            + "</body></html>"
+        )
+    number = 50
+    print(f"共{len(pages)}个页面, 每个页面解析{number}次")
+    for name, func in (
+        ("正则(旧casLogin)", regexParse),
+        ("BeautifulSoup(旧RSALogin)", soupParse),
+        ("LoginPage", LoginPage),
+    ):
+        cost = timeit.timeit(lambda: [func(p) for p in pages], number=number)
+        print(f"{name}: 平均每页{cost / number / len(pages) * 1000:.3f}ms")
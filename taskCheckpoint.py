@@ -0,0 +1,159 @@
+import os
+import time
+import sqlite3
+import argparse
+import datetime
+import threading
+import contextlib
+
+from liteTools import LL, TT
+
+
+class TaskCheckpoint:
+    '''
+    任务完成记录(检查点)。
+    记录每个任务(以用户uuid, 任务类型, 任务标题区分)的完成情况, 同一执行时间窗口内再次运行时, 已完成的任务不再登录和查询。
+    记录中没有任务实例的信息(不登录无法得知当前的任务实例), 所以执行时间窗口覆盖全天时不使用记录, 以免跳过当天新发布的任务。
+    '''
+    fileName = "checkpoint.db"
+    _lock = threading.Lock()
+
+    def __init__(self, dir_: str):
+        '''
+        :params dir_: 记录文件所在文件夹
+        '''
+        self.path = os.path.join(dir_, TaskCheckpoint.fileName)
+        with self._connect() as conn:
+            conn.execute('''CREATE TABLE IF NOT EXISTS checkpoint (
+                uuid TEXT NOT NULL,
+                type INTEGER NOT NULL,
+                title TEXT NOT NULL,
+                username TEXT,
+                code INTEGER,
+                instanceWid TEXT,
+                completedAt REAL,
+                PRIMARY KEY (uuid, type, title))''')
+
+    @contextlib.contextmanager
+    def _connect(self):
+        '''
+        打开数据库连接, 退出时提交并关闭
+        '''
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def genKey(task):
+        '''
+        :params task: handler.SignTask类
+        :returns (uuid, type, title)
+        '''
+        return (task.uuid, int(task.config.get('type') or 0), str(task.config.get('title') or ''))
+
+    def get(self, task, nowTime: float = None):
+        '''
+        查询任务在当前执行时间窗口内的完成记录
+        :params task: handler.SignTask类
+        :params nowTime: 时间戳(默认为脚本启动时间)
+        :returns dict|None: 完成记录, 没有记录或记录已过期时返回None
+        '''
+        nowTime = TT.startTime if nowTime is None else nowTime
+        window = TaskCheckpoint.window(task, nowTime)
+        if not window:
+            return None
+        windowStart = window[0]
+        with TaskCheckpoint._lock, self._connect() as conn:
+            row = conn.execute(
+                'SELECT code, instanceWid, completedAt FROM checkpoint WHERE uuid=? AND type=? AND title=?',
+                TaskCheckpoint.genKey(task)).fetchone()
+        if not row or row[2] < windowStart:
+            return None
+        return {"code": row[0], "instanceWid": row[1], "completedAt": row[2]}
+
+    @staticmethod
+    def window(task, nowTime: float):
+        '''
+        查询任务当前所处的(可以使用完成记录的)执行时间窗口
+        :params task: handler.SignTask类
+        :params nowTime: 时间戳
+        :returns (windowStart, windowEnd)|None: 不在窗口中, 或窗口覆盖全天时返回None
+        '''
+        timeRange = task.config['taskTimeRange']
+        windowStart = TT.windowStart(timeRange, nowTime)
+        if windowStart is None:
+            return None
+        windowEnd = TT.windowEnd(timeRange, nowTime)
+        day = datetime.datetime.fromtimestamp(windowStart).replace(hour=0, minute=0, second=0, microsecond=0)
+        if windowStart == day.timestamp() and windowEnd == (day + datetime.timedelta(days=1)).timestamp():
+            return None
+        return (windowStart, windowEnd)
+
+    def record(self, task):
+        '''
+        记录任务完成情况
+        :params task: handler.SignTask类
+        '''
+        with TaskCheckpoint._lock, self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO checkpoint VALUES (?, ?, ?, ?, ?, ?, ?)',
+                         TaskCheckpoint.genKey(task) + (task.username, task.code, task.instanceWid, time.time()))
+
+    def list(self, username: str = None):
+        '''
+        列出完成记录
+        :params username: 只列出该用户的记录(为空则列出全部)
+        :returns list[dict]
+        '''
+        sql = 'SELECT username, type, title, code, instanceWid, completedAt FROM checkpoint'
+        params = ()
+        if username:
+            sql += ' WHERE username=?'
+            params = (username,)
+        with TaskCheckpoint._lock, self._connect() as conn:
+            rows = conn.execute(sql + ' ORDER BY completedAt', params).fetchall()
+        keys = ("username", "type", "title", "code", "instanceWid", "completedAt")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def reset(self, username: str = None):
+        '''
+        删除完成记录
+        :params username: 只删除该用户的记录(为空则删除全部)
+        :returns int: 删除的记录数
+        '''
+        sql = 'DELETE FROM checkpoint'
+        params = ()
+        if username:
+            sql += ' WHERE username=?'
+            params = (username,)
+        with TaskCheckpoint._lock, self._connect() as conn:
+            return conn.execute(sql, params).rowcount
+
+    @staticmethod
+    def load(dir_: str):
+        '''
+        打开记录文件, 失败时返回None(不影响任务执行)
+        '''
+        try:
+            return TaskCheckpoint(dir_)
+        except (OSError, sqlite3.Error) as e:
+            LL.log(2, f"任务完成记录打开失败, 错误信息: [{e}]")
+            return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="查看/重置任务完成记录")
+    parser.add_argument("action", choices=("list", "reset"), help="list: 查看记录; reset: 删除记录")
+    parser.add_argument("-d", "--dir", default="_cache/", help="记录文件所在文件夹(即配置文件中的cacheDir, 默认为_cache/)")
+    parser.add_argument("-u", "--username", required=False, help="只操作该用户的记录(可选)")
+    args = parser.parse_args()
+    checkpoint = TaskCheckpoint(args.dir)
+    if args.action == "list":
+        for item in checkpoint.list(args.username):
+            completedAt = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(item['completedAt']))
+            print(f"[{item['username']}] 类型{item['type']} 标题「{item['title']}」 状态码{item['code']} "
+                  f"实例{item['instanceWid']} 完成于{completedAt}")
+    else:
+        print(f"已删除{checkpoint.reset(args.username)}条记录")
@@ -1,5 +1,8 @@
 import random
 import re
+import time
+import threading
+from urllib import parse
 
 
 import requests
@@ -8,11 +11,137 @@ from login.Utils import Utils
 from login.casLogin import casLogin
 from login.iapLogin import iapLogin
 from login.RSALogin import RSALogin
-from liteTools import TaskError, LL, ProxyGet, reqSession
+from liteTools import TaskError, LL, ProxyGet, reqSession, CacheDB
 
 requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
 
 
+class TenantDirectory:
+    """
+    今日校园学校(租户)目录缓存。
+    学校列表(tenant/list)和学校信息(tenant/info)在进程内与本地缓存中共享, 过期后使用条件请求(ETag)刷新。
+    """
+
+    listUrl = "https://mobile.campushoy.com/v6/config/guest/tenant/list"
+    infoUrl = "https://mobile.campushoy.com/v6/config/guest/tenant/info"
+    ttl = 86400  # 缓存有效期(秒), 过期后向服务器确认是否有更新
+    keepTime = 30 * 86400  # 本地缓存的保存时间(秒)
+    routeTtl = 6 * 3600  # 登录地址(重定向结果)缓存有效期(秒)
+    _memory = {}  # 进程内缓存: key -> {"fetchedAt", "etag", "data"}
+    _keyLocks = {}  # key -> 刷新该key的锁(同一key只请求一次, 不同key互不阻塞)
+    _lock = threading.Lock()
+
+    @staticmethod
+    def getTenant(session, name: str):
+        """
+        根据学校名称查找学校
+        :returns dict|None: tenant/list中的学校条目, 找不到时返回None
+        """
+        return TenantDirectory._get(session, "list", TenantDirectory._fetchList).get(name)
+
+    @staticmethod
+    def getInfo(session, tenantId: str):
+        """
+        获取学校信息
+        :returns dict: tenant/info返回的学校信息
+        """
+        return TenantDirectory._get(
+            session, f"info:{tenantId}", lambda s, h: TenantDirectory._fetchInfo(s, h, tenantId)
+        )
+
+    @staticmethod
+    def getRoute(tenantId: str):
+        """
+        获取缓存的学校登录地址
+        :returns list|None: [host, login_url, login_host], 没有缓存或已过期时返回None
+        """
+        key = f"route:{tenantId}"
+        with TenantDirectory._lock:
+            entry = TenantDirectory._memory.get(key)
+            if not entry:
+                cache = CacheDB.open("tenants")
+                entry = cache.get(key) if cache else None
+            if not entry or time.time() - entry["fetchedAt"] >= TenantDirectory.routeTtl:
+                return None
+            TenantDirectory._memory[key] = entry
+            return entry["data"]
+
+    @staticmethod
+    def setRoute(tenantId: str, route):
+        """
+        缓存学校登录地址
+        :params route: [host, login_url, login_host], 为空则删除缓存
+        """
+        key = f"route:{tenantId}"
+        with TenantDirectory._lock:
+            cache = CacheDB.open("tenants")
+            if not route:
+                TenantDirectory._memory.pop(key, None)
+                if cache:
+                    cache.delete(key)
+                return
+            entry = {"fetchedAt": time.time(), "data": list(route)}
+            TenantDirectory._memory[key] = entry
+            if cache:
+                cache.set(key, entry, TenantDirectory.routeTtl)
+
+    @staticmethod
+    def _fetchList(session, headers: dict):
+        res = session.get(TenantDirectory.listUrl, headers=headers, verify=False)
+        if res.status_code == 304:
+            return res, None
+        # 以学校名称建立索引
+        return res, {item["name"]: item for item in res.json()["data"]}
+
+    @staticmethod
+    def _fetchInfo(session, headers: dict, tenantId: str):
+        res = session.get(
+            TenantDirectory.infoUrl, params={"ids": tenantId}, headers=headers, verify=False
+        )
+        if res.status_code == 304:
+            return res, None
+        return res, res.json()["data"][0]
+
+    @staticmethod
+    def _get(session, key: str, fetch):
+        """
+        读取缓存, 过期时使用条件请求刷新
+        :params fetch: 请求函数, 参数为(session, 请求头), 返回(响应, 数据)(响应为304时数据为None)
+        """
+        # 进程内缓存有效时不加锁直接返回
+        entry = TenantDirectory._memory.get(key)
+        if entry and time.time() - entry["fetchedAt"] < TenantDirectory.ttl:
+            return entry["data"]
+        with TenantDirectory._lock:
+            keyLock = TenantDirectory._keyLocks.setdefault(key, threading.Lock())
+        # 只在读取本地缓存和请求服务器时持有该key的锁(等待的线程直接使用刷新结果)
+        with keyLock:
+            entry = TenantDirectory._memory.get(key)
+            cache = CacheDB.open("tenants")
+            if not entry and cache:
+                entry = cache.get(key)
+            if entry and time.time() - entry["fetchedAt"] < TenantDirectory.ttl:
+                TenantDirectory._memory[key] = entry
+                return entry["data"]
+            # 缓存过期或不存在, 请求服务器
+            headers = {}
+            if entry and entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            res, data = fetch(session, headers)
+            if data is None:
+                LL.log(1, f"学校目录缓存[{key}]没有变化")
+                data = entry["data"]
+            entry = {
+                "fetchedAt": time.time(),
+                "etag": res.headers.get("ETag"),
+                "data": data,
+            }
+            TenantDirectory._memory[key] = entry
+            if cache:
+                cache.set(key, entry, TenantDirectory.keepTime)
+            return data
+
+
 class TodayLoginService:
     # 初始化本地登录类
     def __init__(self, userInfo):
@@ -29,9 +158,9 @@ class TodayLoginService:
         self.password = userInfo["password"]
         self.schoolName = userInfo["schoolName"]
         self.session = reqSession()
+        # 用户单独设置的请求限制只用于该学校的服务器(见setSchoolHosts)
+        self.session.schoolLimit = userInfo.get("hostLimit")
         headers = {"User-Agent": random.choice(Utils.getUserAgents())}
-        # 关闭多余的连接
-        self.session.keep_alive = False
         # 增加重试次数
         self.session.adapters.DEFAULT_RETRIES = 5
         self.session.headers = headers
@@ -45,55 +174,53 @@ class TodayLoginService:
         self.host = ""
         self.login_host = ""
         self.loginEntity = None
+        self.tenantId = None
+        self.routeFromCache = False  # 登录地址是否来自缓存
 
-    # 通过学校名称借助api获取学校的登陆url
-    def getLoginUrlBySchoolName(self):
-        schools = self.session.get(
-            "https://mobile.campushoy.com/v6/config/guest/tenant/list",
-            verify=False,
-            hooks=dict(response=[Utils.checkStatus]),
-        ).json()["data"]
-        flag = True
-        for item in schools:
-            if item["name"] == self.schoolName:
-                if item["joinType"] == "NONE":
-                    raise TaskError(self.schoolName + "未加入今日校园，请检查...", 301)
-                else:
-                    LL.log(1, f"「{self.schoolName}」接入今日校园方式为「{item['joinType']}」")
-                flag = False
-                params = {"ids": item["id"]}
-                data = self.session.get(
-                    "https://mobile.campushoy.com/v6/config/guest/tenant/info",
-                    params=params,
-                    verify=False,
-                    hooks=dict(response=[Utils.checkStatus]),
-                ).json()["data"][0]
-                joinType = data["joinType"]
-                idsUrl = data["idsUrl"]
-                ampUrl = data["ampUrl"]
-                if "campusphere" in ampUrl or "cpdaily" in ampUrl:
-                    self.host = re.findall("\w{4,5}\:\/\/.*?\/", ampUrl)[0]
-                    status_code = 0
-                    while status_code != 200:
-                        newAmpUrl = self.session.get(
-                            ampUrl, allow_redirects=False, verify=False
-                        )
-                        status_code = newAmpUrl.status_code
-                        if "Location" in newAmpUrl.headers:
-                            ampUrl = newAmpUrl.headers["Location"]
-                    self.login_url = ampUrl
-                    self.login_host = re.findall("\w{4,5}\:\/\/.*?\/", self.login_url)[
-                        0
-                    ]
-                ampUrl2 = data["ampUrl2"]
-                if "campusphere" in ampUrl2 or "cpdaily" in ampUrl2:
-                    self.host = re.findall("\w{4,5}\:\/\/.*?\/", ampUrl2)[0]
-                    ampUrl2 = self.session.get(ampUrl2, verify=False).url
-                    self.login_url = ampUrl2
-                    self.login_host = re.findall(r"\w{4,5}\:\/\/.*?\/", self.login_url)[
-                        0
-                    ]
-                break
+    # 通过学校名称借助api获取学校的登陆url(refresh为真时不使用缓存的登录地址)
+    def getLoginUrlBySchoolName(self, refresh=False):
+        item = TenantDirectory.getTenant(self.session, self.schoolName)
+        if not item:
+            return
+        if item["joinType"] == "NONE":
+            raise TaskError(self.schoolName + "未加入今日校园，请检查...", 301)
+        else:
+            LL.log(1, f"「{self.schoolName}」接入今日校园方式为「{item['joinType']}」")
+        self.tenantId = item["id"]
+        route = None if refresh else TenantDirectory.getRoute(self.tenantId)
+        if route:
+            self.host, self.login_url, self.login_host = route
+            self.routeFromCache = True
+            self.setSchoolHosts()
+            return
+        self.routeFromCache = False
+        data = TenantDirectory.getInfo(self.session, item["id"])
+        joinType = data["joinType"]
+        idsUrl = data["idsUrl"]
+        ampUrl = data["ampUrl"]
+        if "campusphere" in ampUrl or "cpdaily" in ampUrl:
+            self.host = re.findall("\w{4,5}\:\/\/.*?\/", ampUrl)[0]
+            status_code = 0
+            while status_code != 200:
+                newAmpUrl = self.session.get(
+                    ampUrl, allow_redirects=False, verify=False
+                )
+                status_code = newAmpUrl.status_code
+                if "Location" in newAmpUrl.headers:
+                    ampUrl = newAmpUrl.headers["Location"]
+            self.login_url = ampUrl
+            self.login_host = re.findall("\w{4,5}\:\/\/.*?\/", self.login_url)[0]
+        ampUrl2 = data["ampUrl2"]
+        if "campusphere" in ampUrl2 or "cpdaily" in ampUrl2:
+            self.host = re.findall("\w{4,5}\:\/\/.*?\/", ampUrl2)[0]
+            ampUrl2 = self.session.get(ampUrl2, verify=False).url
+            self.login_url = ampUrl2
+            self.login_host = re.findall(r"\w{4,5}\:\/\/.*?\/", self.login_url)[0]
+        self.setSchoolHosts()
+        if self.login_url:
+            TenantDirectory.setRoute(
+                self.tenantId, (self.host, self.login_url, self.login_host)
+            )
 
     # 通过登陆url判断采用哪种登陆方式
     def checkLogin(self):
@@ -128,8 +255,54 @@ class TodayLoginService:
         # 统一登录流程
         self.session.cookies = self.loginEntity.login()
 
+    # 导出登录状态(用于缓存)
+    def dumpSession(self):
+        cookies = [
+            {
+                "name": c.name,
+                "value": c.value,
+                "domain": c.domain,
+                "path": c.path,
+                "secure": c.secure,
+                "expires": c.expires,
+            }
+            for c in self.session.cookies
+        ]
+        return {
+            "cookies": cookies,
+            "host": self.host,
+            "userAgent": self.session.headers.get("User-Agent"),
+        }
+
+    # 载入缓存的登录状态(代替登录)
+    def loadSession(self, data: dict):
+        for c in data["cookies"]:
+            self.session.cookies.set(**c)
+        self.host = data["host"]
+        self.session.headers["User-Agent"] = data["userAgent"]
+        self.setSchoolHosts()
+
+    # 记录学校自己的服务器(用户单独设置的请求限制只用于这些服务器)
+    def setSchoolHosts(self):
+        self.session.schoolHosts = frozenset(
+            parse.urlparse(url).netloc for url in (self.host, self.login_host) if url
+        )
+
     # 本地化登陆
     def login(self):
         # 获取学校登陆地址
         self.getLoginUrlBySchoolName()
-        self.checkLogin()
+        try:
+            self.checkLogin()
+        except TaskError:
+            raise
+        except Exception as e:
+            if not self.routeFromCache:
+                raise
+            # 缓存的登录地址可能已失效, 重新获取登录地址, 如果有变化则重新登录
+            route = (self.host, self.login_url, self.login_host)
+            self.getLoginUrlBySchoolName(refresh=True)
+            if route == (self.host, self.login_url, self.login_host):
+                raise
+            LL.log(2, f"缓存的登录地址已失效[{e}], 使用新的登录地址重新登录")
+            self.checkLogin()